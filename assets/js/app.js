@@ -6,6 +6,10 @@
 // Configuration
 const CONFIG = {
     dataUrl: 'assets/data/timeline-data.json',
+    searchIndexUrl: 'assets/data/search-index.json', // built by scripts/enrich-from-rag.py
+    // Set to 'assets/data/timeline/manifest.json' when publishing the sharded
+    // output of `enrich-from-rag.py --shards`; null loads dataUrl in full
+    shardManifestUrl: null,
     markerRadius: 45, // Larger, more prominent markers
     decades: [
         { key: '1970s', range: '1970-1979', theme: 'Chicano Studies Pioneer', color: '#1e3a5f' },
@@ -37,6 +41,7 @@ const CONFIG = {
 // Global state
 const state = {
     data: null,
+    searchIndex: null,
     activeModal: null,
     selectedDecade: null,
     selectedWork: null,
@@ -46,6 +51,14 @@ const state = {
 // ========== DATA LOADER ==========
 class DataLoader {
     async load() {
+        if (CONFIG.shardManifestUrl) {
+            try {
+                return await this.loadSharded();
+            } catch (error) {
+                console.warn('Sharded data unavailable, loading single file:', error);
+            }
+        }
+
         try {
             const response = await fetch(CONFIG.dataUrl);
             if (!response.ok) {
@@ -53,6 +66,7 @@ class DataLoader {
             }
             const data = await response.json();
             state.data = data;
+            this.loadSearchIndex();
             return data;
         } catch (error) {
             console.error('Error loading data:', error);
@@ -63,6 +77,66 @@ class DataLoader {
         }
     }
 
+    async loadSharded() {
+        const response = await fetch(CONFIG.shardManifestUrl);
+        if (!response.ok) {
+            throw new Error(`Failed to load manifest: ${response.statusText}`);
+        }
+        const manifest = await response.json();
+
+        // The manifest alone is enough to render the timeline
+        const data = { biography: { ...manifest.biography }, decades: {} };
+        for (const [key, decade] of Object.entries(manifest.decades)) {
+            data.decades[key] = { theme: decade.theme, totalWorks: decade.totalWorks, categories: {} };
+        }
+        state.data = data;
+
+        // Summaries, listings and work bodies fill in as their shards arrive
+        this.shardsLoaded = this.loadShards(manifest)
+            .then(() => this.loadSearchIndex())
+            .catch(error => console.error('Error loading data shards:', error));
+        return data;
+    }
+
+    async loadShards(manifest) {
+        const baseUrl = CONFIG.shardManifestUrl.slice(0, CONFIG.shardManifestUrl.lastIndexOf('/') + 1);
+        const fetchShard = async (name) => {
+            const response = await fetch(baseUrl + name);
+            if (!response.ok) {
+                throw new Error(`Failed to load ${name}: ${response.statusText}`);
+            }
+            return response.json();
+        };
+
+        const biography = fetchShard(manifest.biography_shard)
+            .then(details => Object.assign(state.data.biography, details));
+
+        const decades = Object.entries(manifest.decades).map(async ([key, entry]) => {
+            const names = new Set([entry.shard]);
+            for (const category of Object.values(entry.categories)) {
+                names.add(category.shard);
+                names.add(category.bodies);
+            }
+            const shards = {};
+            await Promise.all([...names].map(async name => {
+                shards[name] = await fetchShard(name);
+            }));
+
+            const decade = state.data.decades[key];
+            const { categories, ...details } = shards[entry.shard];
+            Object.assign(decade, details);
+            for (const [category, info] of Object.entries(entry.categories)) {
+                const listing = shards[info.shard].categories[category] || [];
+                const bodies = shards[info.bodies];
+                decade.categories[category] = listing.map(({ id, ...work }) => ({ ...work, ...bodies[id] }));
+            }
+        });
+
+        await Promise.all([biography, ...decades]);
+        // Works were added in place, so the memoized list is stale
+        this.allWorksSource = null;
+    }
+
     getMockData() {
         return {
             biography: {
@@ -235,9 +309,28 @@ class DataLoader {
         };
     }
 
+    // Optional: without the index, searchWorks falls back to a linear scan
+    async loadSearchIndex() {
+        try {
+            const response = await fetch(CONFIG.searchIndexUrl);
+            if (!response.ok) return;
+            const index = await response.json();
+            // Ids are positions in getAllWorks(), so the index must describe exactly these works
+            const works = this.getAllWorks();
+            if (index.version === 2 && index.works === works.length &&
+                index.titles_hash === this.titlesHash(works)) {
+                state.searchIndex = index;
+            }
+        } catch (error) {
+            console.warn('Search index unavailable, using linear search:', error);
+        }
+    }
+
     getAllWorks() {
         if (!state.data?.decades) return [];
+        if (this.allWorksSource === state.data) return this.allWorks;
 
+        // Work ids in the search index are positions in this array
         const works = [];
         for (const decade of Object.values(state.data.decades)) {
             if (decade.categories) {
@@ -246,10 +339,73 @@ class DataLoader {
                 }
             }
         }
+        this.allWorks = works;
+        this.allWorksSource = state.data;
         return works;
     }
 
+    // FNV-1a over UTF-16 code units; keep in step with titles_hash() in scripts/search_index.py
+    titlesHash(works) {
+        const text = works.map(work => work.title || '').join('\n');
+        let hash = 0x811c9dc5;
+        for (let i = 0; i < text.length; i++) {
+            hash ^= text.charCodeAt(i);
+            hash = Math.imul(hash, 0x01000193) >>> 0;
+        }
+        return hash.toString(16).padStart(8, '0');
+    }
+
+    // Keep in step with search_tokens() in scripts/search_index.py
+    tokenizeSearchText(text) {
+        return text.normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase().match(/[a-z0-9]+/g) || [];
+    }
+
+    indexPrefixIds(prefix) {
+        const { terms, postings } = state.searchIndex;
+
+        // Binary search for the first term >= prefix
+        let low = 0;
+        let high = terms.length;
+        while (low < high) {
+            const mid = (low + high) >> 1;
+            if (terms[mid] < prefix) low = mid + 1;
+            else high = mid;
+        }
+
+        const ids = new Set();
+        for (let i = low; i < terms.length && terms[i].startsWith(prefix); i++) {
+            let id = 0;
+            for (const delta of postings[i]) {
+                id += delta;
+                ids.add(id);
+            }
+        }
+        return ids;
+    }
+
+    // Query words match the start of indexed words ("hist" finds "History",
+    // "story" does not), unlike the substring scan below; mid-word matches are
+    // traded for lookups that stay fast as the catalogue grows
+    searchIndexed(query) {
+        const tokens = [...new Set(this.tokenizeSearchText(query))].sort((a, b) => b.length - a.length);
+        if (tokens.length === 0) return [];
+
+        let result = null;
+        for (const token of tokens) {
+            const ids = this.indexPrefixIds(token);
+            result = result === null ? ids : new Set([...result].filter(id => ids.has(id)));
+            if (result.size === 0) return [];
+        }
+
+        const allWorks = this.getAllWorks();
+        return [...result].sort((a, b) => a - b).map(id => allWorks[id]);
+    }
+
     searchWorks(query) {
+        if (state.searchIndex) {
+            return this.searchIndexed(query);
+        }
+
         const allWorks = this.getAllWorks();
         const lowerQuery = query.toLowerCase();
 
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Benchmark the enrichment build as the catalogue grows.
+
+For each size, generates a synthetic timeline (in build-data.js's shape)
+and a matching RAG corpus directory, then runs enrich-from-rag.py on it
+from scratch with --profile and collects the per-phase timings and peak
+memory into one JSON results file. Compare a results file with an
+earlier one through --baseline to spot regressions between versions.
+
+Usage: python benchmark-build.py [--sizes 10000,100000,1000000]
+                                 [--results PATH] [--baseline PATH]
+                                 [--data-dir DIR] [--warm]
+"""
+
+import argparse
+import importlib.util
+import json
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from phase_timer import format_bytes
+
+SCRIPTS_DIR = Path(__file__).parent
+ENRICH_SCRIPT = SCRIPTS_DIR / "enrich-from-rag.py"
+
+DECADES = {
+    "1970s": ("Chicano Studies Pioneer", 1970),
+    "1980s": ("Multicultural Education Leader", 1980),
+    "1990s": ("Media & Diversity Scholar", 1990),
+    "2000s": ("Creative Consulting", 2000),
+    "2010s": ("Creative Works & Memoirs", 2010),
+    "2020s": ("Anti-Racism & Renewal", 2020),
+}
+CATEGORIES = ["Articles", "Blogs", "Books - Scholarly", "Books - Edited Works", "Curriculum Development",
+              "Consulting Projects", "Teaching Materials", "Videos", "Plays", "Administrative Work"]
+CORPUS_FOLDERS = ["blog_posts", "interviews", "articles", "speeches"]
+TOPIC_WORDS = [
+    "chicano", "history", "media", "diversity", "education", "multicultural",
+    "brazil", "politics", "memoir", "ethnic", "studies", "curriculum",
+    "riverside", "speech", "civic", "engagement", "children", "watching",
+    "identity", "renewal", "manifesto", "culture", "latino", "humor",
+]
+VOCABULARY_SIZE = 20000
+WORKS_PER_DOCUMENT = 100     # corpus documents scale with the catalogue
+TITLES_PER_DOCUMENT = 5      # work titles quoted in each corpus document
+ENHANCED_SHARE = 0.01        # works whose title contains an enhancement key
+
+
+def enhancement_keys():
+    """Keys of the real enhancement table, so matching does the same work it does in production."""
+    spec = importlib.util.spec_from_file_location("enrich_from_rag", ENRICH_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return list(module.enhance_work_descriptions())
+
+def make_vocabulary(rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = {"".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(VOCABULARY_SIZE)}
+    return TOPIC_WORDS + sorted(words)
+
+def generate_timeline(works, rng, vocabulary, keys):
+    """A timeline with works spread over the decades and categories, as build-data.js would write it."""
+    timeline = {
+        "biography": {"name": "Synthetic", "awards": []},
+        "decades": {key: {"theme": theme, "totalWorks": 0, "categories": {}} for key, (theme, _) in DECADES.items()},
+    }
+    for number in range(works):
+        decade_key = rng.choice(list(DECADES))
+        category = rng.choice(CATEGORIES)
+        title = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, 8))).capitalize()
+        if rng.random() < ENHANCED_SHARE:
+            title = f"{title} {rng.choice(keys)}"
+        decade = timeline["decades"][decade_key]
+        decade["categories"].setdefault(category, []).append({
+            "title": f"{title} {number}",
+            "year": DECADES[decade_key][1] + rng.randint(0, 9),
+            "category": category,
+            "description": " ".join(rng.choice(vocabulary) for _ in range(rng.randint(10, 30))),
+            "awards": None,
+            "isbn": None,
+            "url": None,
+            "significance": None,
+        })
+        decade["totalWorks"] += 1
+    return timeline
+
+def generate_corpus(corpus_dir, titles, rng, vocabulary):
+    """Write text documents quoting work titles; returns (documents, bytes)."""
+    extracted = Path(corpus_dir) / "extracted"
+    for folder in CORPUS_FOLDERS:
+        (extracted / folder).mkdir(parents=True, exist_ok=True)
+
+    documents = max(10, len(titles) // WORKS_PER_DOCUMENT)
+    total_bytes = 0
+    for number in range(documents):
+        paragraphs = []
+        for _ in range(rng.randint(5, 20)):
+            sentence = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(40, 120)))
+            paragraphs.append(sentence.capitalize() + ".")
+        for title in rng.sample(titles, min(TITLES_PER_DOCUMENT, len(titles))):
+            position = rng.randrange(len(paragraphs))
+            paragraphs[position] += f" As discussed in {title}, the argument continues."
+        text = f"Document {number}\n\n" + "\n\n".join(paragraphs) + "\n"
+        path = extracted / CORPUS_FOLDERS[number % len(CORPUS_FOLDERS)] / f"document-{number:07d}.txt"
+        data = text.encode("utf-8")
+        path.write_bytes(data)
+        total_bytes += len(data)
+    return documents, total_bytes
+
+def prepare_data(size_dir, works, seed, keys):
+    """Generate (or reuse) the timeline and corpus for one size. Returns their description."""
+    info_path = size_dir / "dataset.json"
+    if info_path.exists():
+        with open(info_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    rng = random.Random(seed + works)
+    vocabulary = make_vocabulary(rng)
+    started = time.perf_counter()
+    timeline = generate_timeline(works, rng, vocabulary, keys)
+    timeline_path = size_dir / "timeline.json"
+    size_dir.mkdir(parents=True, exist_ok=True)
+    with open(timeline_path, "w", encoding="utf-8") as f:
+        json.dump(timeline, f, indent=2, ensure_ascii=False)
+
+    titles = [work["title"] for decade in timeline["decades"].values()
+              for category_works in decade["categories"].values() for work in category_works]
+    del timeline
+    corpus_dir = size_dir / "dr-cortes-rag-corpus"
+    documents, corpus_bytes = generate_corpus(corpus_dir, titles, rng, vocabulary)
+
+    info = {
+        "works": works,
+        "timeline_bytes": timeline_path.stat().st_size,
+        "corpus_documents": documents,
+        "corpus_bytes": corpus_bytes,
+        "generation_seconds": time.perf_counter() - started,
+    }
+    with open(info_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    return info
+
+def run_enrichment(size_dir, args, force):
+    """Run enrich-from-rag.py on one generated dataset; returns its --profile results, or an error."""
+    profile_path = size_dir / ("profile-cold.json" if force else "profile-warm.json")
+    (size_dir / "pdfs").mkdir(exist_ok=True)
+    command = [
+        sys.executable, str(ENRICH_SCRIPT),
+        "--timeline", str(size_dir / "timeline.json"),
+        "--output", str(size_dir / "output.json"),
+        "--corpus-dir", str(size_dir / "dr-cortes-rag-corpus"),
+        "--pdf-dir", str(size_dir / "pdfs"),
+        "--cache-dir", str(size_dir / "cache"),
+        "--search-index", str(size_dir / "search-index.json"),
+        "--related-passages", str(size_dir / "related-passages.json"),
+        "--top-k", str(args.top_k),
+        "--profile", str(profile_path),
+    ]
+    if args.workers is not None:
+        command += ["--workers", str(args.workers)]
+    if args.shards:
+        command += ["--shards", str(size_dir / "shards")]
+    if force:
+        # Cold means no cached corpus, PDF text or passage index, and no earlier outputs to compare against
+        for name in ("cache", "shards"):
+            shutil.rmtree(size_dir / name, ignore_errors=True)
+        for name in ("output.json", "search-index.json", "related-passages.json"):
+            (size_dir / name).unlink(missing_ok=True)
+        command.append("--force")
+
+    with open(size_dir / ("enrich-cold.log" if force else "enrich-warm.log"), "w", encoding="utf-8") as log:
+        completed = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT)
+    if completed.returncode != 0:
+        return {"error": f"enrich-from-rag.py exited with status {completed.returncode}; see {log.name}"}
+    with open(profile_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=SCRIPTS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_run(run, baseline_runs):
+    profile = run["cold"]
+    print(f"\n{run['works']} works, {run['corpus_documents']} corpus documents "
+          f"({format_bytes(run['corpus_bytes'])}), timeline {format_bytes(run['timeline_bytes'])}")
+    if "error" in profile:
+        print(f"  {profile['error']}")
+        return
+
+    baseline = baseline_runs.get(run["works"], {}).get("cold", {})
+    baseline_phases = {phase["phase"]: phase["seconds"] for phase in baseline.get("phases", [])}
+    rows = [(phase["phase"], phase["seconds"]) for phase in profile["phases"]]
+    rows.append(("total", profile["total_seconds"]))
+    if baseline:
+        baseline_phases["total"] = baseline["total_seconds"]
+    for name, seconds in rows:
+        line = f"  {name:<14} {seconds:>9.3f} s"
+        if baseline_phases.get(name):
+            line += f"  {seconds / baseline_phases[name]:>6.2f}x baseline"
+        print(line)
+    print(f"  {'peak memory':<14} {format_bytes(profile['peak_rss_bytes']):>11}"
+          f"  (workers {format_bytes(profile['peak_children_rss_bytes'])})")
+    if "warm" in run and "error" not in run["warm"]:
+        print(f"  {'unchanged rerun':<14} {run['warm']['total_seconds']:>9.3f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated catalogue sizes")
+    parser.add_argument("--results", type=Path, default=Path("benchmark-results.json"), help="Results JSON to write")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--data-dir", type=Path, default=None,
+                        help="Keep generated catalogues here and reuse them (default: a temporary directory)")
+    parser.add_argument("--warm", action="store_true", help="Also time an unchanged rerun of each size")
+    parser.add_argument("--workers", type=int, default=None, help="Passed to enrich-from-rag.py")
+    parser.add_argument("--top-k", type=int, default=3, help="Passed to enrich-from-rag.py (0 disables retrieval)")
+    parser.add_argument("--shards", action="store_true", help="Also write sharded output")
+    parser.add_argument("--seed", type=int, default=1934)
+    args = parser.parse_args()
+
+    baseline_runs = {}
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline_runs = {run["works"]: run for run in json.load(f)["runs"]}
+
+    data_dir = args.data_dir or Path(tempfile.mkdtemp(prefix="enrich-benchmark-"))
+    keys = enhancement_keys()
+    results = {
+        "version": 1,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"workers": args.workers, "top_k": args.top_k, "shards": args.shards, "seed": args.seed},
+        "runs": [],
+    }
+    try:
+        for works in (int(size) for size in args.sizes.split(",")):
+            size_dir = data_dir / f"works-{works}"
+            print(f"Preparing {works} works in {size_dir}...")
+            run = prepare_data(size_dir, works, args.seed, keys)
+            print(f"Running enrich-from-rag.py on {works} works...")
+            run["cold"] = run_enrichment(size_dir, args, force=True)
+            if args.warm and "error" not in run["cold"]:
+                run["warm"] = run_enrichment(size_dir, args, force=False)
+            results["runs"].append(run)
+            print_run(run, baseline_runs)
+
+            # Write after every size, so a run killed at 1M keeps the smaller results
+            with open(args.results, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"\nResults written to {args.results}")
+
+if __name__ == "__main__":
+    main()
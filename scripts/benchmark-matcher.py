@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark work-title matching as the enhancement table grows.
+Compares the old per-key substring loop with the KeyMatcher automaton
+on synthetic titles and keys.
+
+Usage: python benchmark-matcher.py [--works N] [--keys 10,100,1000,...]
+"""
+
+import argparse
+import random
+import time
+
+from rag_matcher import KeyMatcher
+
+WORDS = [
+    "chicano", "history", "media", "diversity", "education", "multicultural",
+    "brazil", "politics", "memoir", "ethnic", "studies", "curriculum",
+    "riverside", "speech", "civic", "engagement", "children", "watching",
+    "identity", "renewal", "manifesto", "culture", "latino", "humor",
+    "television", "textbook", "anti-racism", "vision", "museum", "poetry",
+]
+
+def random_phrase(rng, min_words, max_words):
+    return " ".join(rng.choice(WORDS) + str(rng.randint(0, 999))
+                    for _ in range(rng.randint(min_words, max_words)))
+
+def naive_match(titles, keys):
+    """The original apply_enhancements loop: first key in table order wins."""
+    hits = 0
+    for title in titles:
+        title_lower = title.lower()
+        for key in keys:
+            if key in title_lower:
+                hits += 1
+                break
+    return hits
+
+def matcher_match(titles, matcher):
+    hits = 0
+    for title in titles:
+        if matcher.match(title)[0] is not None:
+            hits += 1
+    return hits
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--works", type=int, default=400, help="Number of synthetic titles")
+    parser.add_argument("--keys", default="10,100,1000,5000", help="Comma-separated key counts")
+    parser.add_argument("--seed", type=int, default=1934)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    key_counts = [int(count) for count in args.keys.split(",")]
+    all_keys = list(dict.fromkeys(random_phrase(rng, 1, 3) for _ in range(max(key_counts) * 2)))
+    titles = [random_phrase(rng, 4, 12) for _ in range(args.works)]
+
+    print(f"{args.works} titles")
+    print(f"{'keys':>8} {'build ms':>10} {'naive ms':>10} {'matcher ms':>11} {'hits':>6}")
+    for count in key_counts:
+        keys = all_keys[:count]
+        # Plant roughly one key in every other title so both paths do real work
+        sample = [f"{title} {rng.choice(keys)}" if i % 2 else title for i, title in enumerate(titles)]
+
+        matcher, build_time = timed(KeyMatcher, keys)
+        naive_hits, naive_time = timed(naive_match, sample, keys)
+        matcher_hits, matcher_time = timed(matcher_match, sample, matcher)
+        assert naive_hits == matcher_hits, "matcher disagrees with substring loop"
+
+        print(f"{count:>8} {build_time * 1000:>10.1f} {naive_time * 1000:>10.1f} "
+              f"{matcher_time * 1000:>11.1f} {matcher_hits:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -7,18 +7,69 @@ Uses extracted text from dr-cortes-rag-corpus to enhance:
 - Work descriptions
 """
 
+import argparse
+import asyncio
 import json
+import multiprocessing
+import time
 from pathlib import Path
 
+import enrich_cache
+import enrich_pipeline
+import pdf_extract
+import phase_timer
+import rag_corpus
+import rag_matcher
+import rag_retrieval
+import record_linkage
+import search_index
+import timeline_shards
+from enrich_cache import (Manifest, hash_bytes, hash_file, hash_json, hash_sources, stat_fingerprint, strip_enrichment,
+                          write_if_changed)
+from enrich_pipeline import (annotate_timeline, apply_enhancements, build_related_passages, build_work_matcher,
+                             collect_work_phrases, corpus_entries, corpus_files, decade_input_hashes,
+                             extract_pdf_entries, iter_works, link_decade_passages, load_corpus_index,
+                             load_passage_index, passage_texts, published_timeline, reuse_decades,
+                             serialize_related_passages, serialize_timeline, source_pdfs, works_input_hash)
+from live_timeline import LiveTimeline
+from phase_timer import PhaseTimer
+from rag_retrieval import MIN_RELATIVE_SCORE
+from record_linkage import CSV_PATH, parse_bibliography
+from search_index import build_search_index, serialize_search_index
+from timeline_server import ResourceStore, TimelineServer, watch
+from timeline_shards import MANIFEST_NAME as SHARD_MANIFEST_NAME
+from timeline_shards import SHARD_BY_CATEGORY, SHARD_BY_DECADE, build_shards, encode_shard, write_shards
+
 # Paths
 WEBSITE_DIR = Path(__file__).parent.parent
 RAG_CORPUS_DIR = Path(__file__).parent.parent.parent / "dr-cortes-rag-corpus"
 TIMELINE_PATH = WEBSITE_DIR / "assets" / "data" / "timeline-data.json"
 OUTPUT_PATH = WEBSITE_DIR / "assets" / "data" / "timeline-data.json"
+SEARCH_INDEX_PATH = WEBSITE_DIR / "assets" / "data" / "search-index.json"
+RELATED_PASSAGES_PATH = WEBSITE_DIR / "assets" / "data" / "related-passages.json"
+SHARD_DIR = WEBSITE_DIR / "assets" / "data" / "timeline"
+BIBLIOGRAPHY_PATH = WEBSITE_DIR / "Dr_Carlos_Cortes_Annotated_Bibliography_APA7.txt"
+CACHE_DIR = Path(__file__).parent / ".enrich-cache"
+
+# Where --serve publishes the in-memory outputs; the same URLs the site loads from disk
+DATA_URL = "/" + OUTPUT_PATH.relative_to(WEBSITE_DIR).as_posix()
+SEARCH_INDEX_URL = "/" + SEARCH_INDEX_PATH.relative_to(WEBSITE_DIR).as_posix()
+RELATED_PASSAGES_URL = "/" + RELATED_PASSAGES_PATH.relative_to(WEBSITE_DIR).as_posix()
+SHARD_URL = "/" + SHARD_DIR.relative_to(WEBSITE_DIR).as_posix()
+SERVE_PORT = 8000
+
+# Code whose changes invalidate every cached result
+PIPELINE_SOURCES = [Path(__file__), Path(enrich_cache.__file__), Path(enrich_pipeline.__file__), Path(pdf_extract.__file__),
+                    Path(phase_timer.__file__), Path(rag_corpus.__file__), Path(rag_matcher.__file__),
+                    Path(rag_retrieval.__file__), Path(record_linkage.__file__), Path(search_index.__file__),
+                    Path(timeline_shards.__file__)]
+
+# Default number of corpus passages attached per work as related_passages
+RELATED_PASSAGES_TOP_K = 3
 
-def load_timeline():
+def load_timeline(path=TIMELINE_PATH):
     """Load existing timeline data."""
-    with open(TIMELINE_PATH, 'r', encoding='utf-8') as f:
+    with open(path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
 def create_enhanced_biography():
@@ -185,50 +236,47 @@ def enhance_work_descriptions():
         }
     }
 
-def apply_enhancements(timeline, decade_summaries, work_enhancements):
-    """Apply enhancements to timeline data."""
-
-    # Enhance decades with summaries
-    for decade_key, summary_data in decade_summaries.items():
-        if decade_key in timeline["decades"]:
-            timeline["decades"][decade_key]["summary"] = summary_data["summary"]
-            timeline["decades"][decade_key]["key_achievements"] = summary_data["key_achievements"]
-
-    # Enhance individual works
-    for decade_key, decade_data in timeline["decades"].items():
-        for category, works in decade_data.get("categories", {}).items():
-            for work in works:
-                title_lower = work.get("title", "").lower()
-                for match_key, enhancement in work_enhancements.items():
-                    if match_key in title_lower:
-                        work["enhanced_description"] = enhancement["enhanced_description"]
-                        work["related_themes"] = enhancement["related_themes"]
-                        work["corpus_sources"] = ["dr-cortes-rag-corpus/extracted/blog_posts/"]
-                        break
-
-    return timeline
+def reuse_cached_decades(timeline, decade_hashes, manifest):
+    """
+    Copy enriched decades whose input hash is unchanged from the cached
+    output into timeline. Returns the keys of the decades still to enrich.
+    """
+    previous = manifest.get("decades", {})
+    unchanged = any(previous.get(key) == digest for key, digest in decade_hashes.items())
+    cached = manifest.cached_output() if unchanged else None
+    cached_decades = json.loads(cached)["decades"] if cached is not None else {}
+    return reuse_decades(timeline, decade_hashes, previous, cached_decades)
 
-def main():
-    print("Loading timeline data...")
-    timeline = load_timeline()
+def write_search_index(timeline, path):
+    """Emit the prebuilt search index for the enriched timeline."""
+    index = build_search_index(timeline)
+    if write_if_changed(path, serialize_search_index(index)):
+        print(f"Wrote search index ({len(index['terms'])} terms) to {path}")
 
-    print("Creating enhanced biography...")
-    timeline["biography"] = create_enhanced_biography()
-
-    print("Creating decade summaries...")
-    decade_summaries = create_decade_summaries()
+def write_related_passages(timeline, path):
+    related = build_related_passages(timeline)
+    if write_if_changed(path, serialize_related_passages(related)):
+        print(f"Wrote related passages for {len(related['passages'])} works to {path}")
 
-    print("Creating work enhancements...")
-    work_enhancements = enhance_work_descriptions()
+def write_derived_outputs(timeline, args):
+    """Write everything built from the enriched timeline besides the timeline itself."""
+    write_search_index(timeline, args.search_index)
+    write_related_passages(timeline, args.related_passages)
+    if args.shards is not None:
+        written, total = write_shards(timeline, args.shards, args.shard_by)
+        print(f"Sharded output: {written} of {total} files updated in {args.shards}")
 
-    print("Applying enhancements...")
-    timeline = apply_enhancements(timeline, decade_summaries, work_enhancements)
+def derived_settings(args):
+    """Options that shape the derived outputs; a change means rewriting them."""
+    return [str(args.search_index), str(args.related_passages),
+            str(args.shards) if args.shards is not None else None, args.shard_by]
 
-    print(f"Writing enhanced timeline to {OUTPUT_PATH}...")
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(timeline, f, indent=2, ensure_ascii=False)
+def derived_outputs_missing(args):
+    if not args.search_index.exists() or not args.related_passages.exists():
+        return True
+    return args.shards is not None and not (args.shards / SHARD_MANIFEST_NAME).exists()
 
-    # Print summary
+def print_summary(timeline, corpus_index, match_report):
     print("\n=== Enhancement Summary ===")
     print(f"Biography: Added personal_background and {len(timeline['biography']['timeline_highlights'])} timeline highlights")
 
@@ -245,7 +293,244 @@ def main():
                     enhanced_works += 1
 
     print(f"\nWorks enhanced: {enhanced_works}")
-    print(f"\nOutput saved to: {OUTPUT_PATH}")
+    if corpus_index is not None:
+        backed_works = sum(1 for _, _, work in iter_works(timeline) if work.get("corpus_sources"))
+        print(f"Works with corpus sources: {backed_works}")
+    linked_works = sum(1 for _, _, work in iter_works(timeline) if work.get("related_passages"))
+    if linked_works:
+        print(f"Works with related passages: {linked_works}")
+    # Counted as annotate_works() counts; not every linked entry has an annotation
+    linked_entries = sum(1 for _, _, work in iter_works(timeline) if work.get("citation") or work.get("annotation"))
+    if linked_entries:
+        print(f"Works linked to annotated bibliography entries: {linked_entries}")
+
+    ambiguous = [entry for entry in match_report if len(entry[3]) > 1]
+    if ambiguous:
+        print(f"Works matching several keys (first key wins): {len(ambiguous)}")
+        for decade, category, title, keys in ambiguous:
+            print(f"  {decade} / {category}: {title} <- {', '.join(keys)}")
+
+# --- Watch-and-serve -------------------------------------------------------
+
+def served_outputs(timeline, shard_by):
+    """{url_path: bytes} of everything --serve publishes for timeline."""
+    outputs = {
+        DATA_URL: serialize_timeline(published_timeline(timeline)),
+        SEARCH_INDEX_URL: serialize_search_index(build_search_index(timeline)),
+        RELATED_PASSAGES_URL: serialize_related_passages(build_related_passages(timeline)),
+    }
+    for name, value in build_shards(timeline, shard_by).items():
+        outputs[f"{SHARD_URL}/{name}"] = encode_shard(value)
+    return outputs
+
+def serve(args):
+    """Serve the enriched timeline from memory, rebuilding it whenever an input changes."""
+    # Rebuilds run in an executor thread, and forking a process that has threads can
+    # deadlock the children, so the pools start their workers from a clean process
+    start_methods = multiprocessing.get_all_start_methods()
+    multiprocessing.set_start_method("forkserver" if "forkserver" in start_methods else "spawn", force=True)
+
+    live = LiveTimeline(args, create_enhanced_biography(), create_decade_summaries(), enhance_work_descriptions(),
+                        BIBLIOGRAPHY_PATH, WEBSITE_DIR)
+    store = ResourceStore()
+
+    def rebuild():
+        started = time.perf_counter()
+        try:
+            timeline, changed_decades = live.rebuild()
+            changed = store.update(served_outputs(timeline, args.shard_by))
+        except Exception as error:
+            # Typically a file caught mid-save; the next change triggers another attempt
+            print(f"Rebuild failed, still serving the previous timeline: {error!r}")
+            return
+        print(f"Rebuilt in {(time.perf_counter() - started) * 1000:.0f} ms: "
+              f"{len(changed_decades)} of {len(live.decade_hashes)} decades re-enriched, "
+              f"{len(changed)} of {len(store.resources)} outputs changed")
+
+    print("Building the in-memory timeline...")
+    rebuild()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+
+        async def on_change():
+            # Rebuild off the event loop so requests keep being answered meanwhile
+            await loop.run_in_executor(None, rebuild)
+
+        server = await TimelineServer(store, WEBSITE_DIR).start(args.host, args.serve)
+        print(f"Serving {WEBSITE_DIR} on http://{args.host}:{args.serve}/ (timeline at {DATA_URL}, "
+              f"shards under {SHARD_URL}/); watching inputs for changes, Ctrl-C to stop")
+        async with server:
+            await watch(live.watched_paths, on_change)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Enrich timeline-data.json with content from RAG corpus.")
+    parser.add_argument("--timeline", type=Path, default=TIMELINE_PATH, help="Input timeline JSON")
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH, help="Output timeline JSON")
+    parser.add_argument("--corpus-dir", type=Path, default=RAG_CORPUS_DIR, help="dr-cortes-rag-corpus directory")
+    parser.add_argument("--pdf-dir", type=Path, action="append", dest="pdf_dirs", default=None,
+                        help="Directory of source PDFs to extract and ingest; repeatable "
+                             "(default: the PDFs at the top of the website)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Corpus ingestion and PDF extraction processes (default: one per core, 1 = in-process)")
+    parser.add_argument("--top-k", type=int, default=RELATED_PASSAGES_TOP_K,
+                        help="Related corpus passages attached per work (0 disables retrieval)")
+    parser.add_argument("--min-passage-score", type=float, default=MIN_RELATIVE_SCORE,
+                        help="Related passages must score at least this fraction (0-1) of the best BM25 score "
+                             f"their work's title and description could reach (default {MIN_RELATIVE_SCORE})")
+    parser.add_argument("--search-index", type=Path, default=SEARCH_INDEX_PATH, help="Output search index JSON")
+    parser.add_argument("--related-passages", type=Path, default=RELATED_PASSAGES_PATH,
+                        help="Output JSON of related corpus passages by work id (kept out of the timeline)")
+    parser.add_argument("--shards", type=Path, nargs="?", const=SHARD_DIR, default=None,
+                        help=f"Also write sharded, precompressed output (default dir: {SHARD_DIR})")
+    parser.add_argument("--shard-by", choices=(SHARD_BY_DECADE, SHARD_BY_CATEGORY), default=SHARD_BY_DECADE,
+                        help="One listing shard per decade, or per decade and category")
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR, help="Incremental build manifest directory")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and rebuild everything")
+    parser.add_argument("--profile", nargs="?", const="-", default=None, metavar="JSON",
+                        help="Report per-phase timings and peak memory; with a path, also write them as JSON")
+    parser.add_argument("--serve", type=int, nargs="?", const=SERVE_PORT, default=None, metavar="PORT",
+                        help=f"Instead of writing outputs, keep the enriched timeline in memory, serve the site "
+                             f"and its data on PORT (default {SERVE_PORT}) and rebuild on every input change")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface --serve listens on")
+    parser.add_argument("--csv", type=Path, nargs="?", const=CSV_PATH, default=None,
+                        help=f"With --serve, rebuild the works from this CSV database as build-data.js does, "
+                             f"instead of serving the works in --timeline (default CSV: {CSV_PATH.name})")
+    return parser.parse_args()
+
+def enrich(args, timer):
+    """The enrichment run; timer is lapped at the end of every phase, even ones with nothing to do."""
+    manifest = Manifest(args.cache_dir)
+    if args.force:
+        manifest.data = {}
+
+    print("Loading timeline data...")
+    input_bytes = args.timeline.read_bytes()
+    input_hash = hash_bytes(input_bytes)
+
+    print("Creating enhanced biography...")
+    biography = create_enhanced_biography()
+
+    print("Creating decade summaries...")
+    decade_summaries = create_decade_summaries()
+
+    print("Creating work enhancements...")
+    work_enhancements = enhance_work_descriptions()
+
+    code_hash = hash_sources(PIPELINE_SOURCES)
+    retrieval_enabled = args.top_k > 0 and rag_retrieval.available()
+    bibliography_hash = hash_file(BIBLIOGRAPHY_PATH) if BIBLIOGRAPHY_PATH.is_file() else None
+    tables_hash = hash_json([code_hash, biography, decade_summaries, work_enhancements,
+                             bibliography_hash, retrieval_enabled and [args.top_k, args.min_passage_score]])
+    entries = corpus_entries(args.corpus_dir)
+    pdf_paths = source_pdfs(args.pdf_dirs, WEBSITE_DIR)
+    corpus_stat = hash_json([stat_fingerprint(path for path, _ in entries), stat_fingerprint(pdf_paths),
+                             pdf_extract.available()])
+    timer.lap("load")
+
+    # Nothing changed since the last run: the cached output is the answer
+    if (tables_hash == manifest.get("tables") and corpus_stat == manifest.get("corpus_stat")
+            and input_hash in (manifest.get("input"), manifest.get("published"))):
+        # The cache holds the full enriched timeline; --output is its published form
+        cached = manifest.cached_output()
+        if cached is not None:
+            if args.output.is_file() and hash_file(args.output) == manifest.get("published"):
+                print(f"Inputs unchanged; {args.output} is up to date")
+            else:
+                write_if_changed(args.output, serialize_timeline(published_timeline(json.loads(cached))))
+                print(f"Inputs unchanged; restored {args.output} from cache")
+            if derived_settings(args) != manifest.get("derived") or derived_outputs_missing(args):
+                write_derived_outputs(json.loads(cached), args)
+                manifest.save(dict(manifest.data, derived=derived_settings(args)), cached)
+            timer.lap("write")
+            return
+
+    timeline = strip_enrichment(json.loads(input_bytes))
+    timeline["biography"] = biography
+    timer.lap("parse")
+
+    if not entries:
+        print(f"RAG corpus not found at {args.corpus_dir}")
+    if pdf_paths:
+        print("Extracting source PDF text...")
+        entries += extract_pdf_entries(pdf_paths, args.cache_dir, WEBSITE_DIR, args.workers)
+
+    print(f"Ingesting RAG corpus from {args.corpus_dir}...")
+    phrases = collect_work_phrases(timeline, work_enhancements)
+    corpus_index, corpus_entry = load_corpus_index(entries, phrases, args.workers, manifest.get("corpus"))
+    timer.lap("corpus")
+
+    texts = passage_texts(corpus_files(corpus_entry), BIBLIOGRAPHY_PATH, bibliography_hash)
+    passage_index = None
+    if retrieval_enabled:
+        print("Indexing corpus passages for retrieval...")
+        passage_index = load_passage_index(texts, args.cache_dir, args.workers)
+    elif args.top_k > 0:
+        print("numpy/scipy not installed; skipping related passage retrieval")
+    timer.lap("passage index")
+
+    works_hash = works_input_hash(work_enhancements, bibliography_hash, corpus_index, passage_index,
+                                  [code_hash, args.top_k, args.min_passage_score])
+    decade_hashes = decade_input_hashes(timeline, decade_summaries, works_hash)
+    changed_decades = reuse_cached_decades(timeline, decade_hashes, manifest)
+
+    print(f"Applying enhancements to {len(changed_decades)} of {len(decade_hashes)} decades...")
+    match_report = []
+    timeline = apply_enhancements(timeline, decade_summaries, work_enhancements,
+                                  build_work_matcher(work_enhancements), match_report, corpus_index,
+                                  changed_decades)
+    timer.lap("matching")
+
+    if passage_index is not None and changed_decades:
+        linked, changed_works = link_decade_passages(timeline, changed_decades, passage_index, texts,
+                                                     args.top_k, args.min_passage_score)
+        print(f"Linked {linked} of {changed_works} works to corpus passages")
+    timer.lap("passages")
+
+    if bibliography_hash is not None:
+        annotated = annotate_timeline(timeline, parse_bibliography(BIBLIOGRAPHY_PATH))
+        print(f"Linked {annotated} works to annotated bibliography entries")
+    timer.lap("bibliography")
+
+    output_bytes = serialize_timeline(published_timeline(timeline))
+    cached_bytes = serialize_timeline(timeline)
+    timer.lap("serialization")
+    if write_if_changed(args.output, output_bytes):
+        print(f"Wrote enhanced timeline to {args.output}")
+    else:
+        print(f"{args.output} is already up to date; not rewritten")
+    write_derived_outputs(timeline, args)
+
+    manifest.save({
+        "tables": tables_hash,
+        "corpus_stat": corpus_stat,
+        "corpus": corpus_entry or {},
+        "decades": decade_hashes,
+        "input": input_hash,
+        "published": hash_bytes(output_bytes),
+        "derived": derived_settings(args),
+    }, cached_bytes)
+    timer.lap("write")
+
+    print_summary(timeline, corpus_index, match_report)
+    print(f"\nOutput saved to: {args.output}")
+
+def main():
+    args = parse_args()
+    if args.serve is not None:
+        serve(args)
+        return
+    timer = PhaseTimer()
+    enrich(args, timer)
+    if args.profile is not None:
+        print(timer.report())
+        if args.profile != "-":
+            timer.write(args.profile)
 
 if __name__ == "__main__":
     main()
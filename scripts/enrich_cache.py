@@ -0,0 +1,187 @@
+"""
+Content-hash manifest for incremental runs of enrich-from-rag.py.
+
+The manifest records hashes of every enrichment input (the timeline file
+build-data.js produced from the CSV, each decade's works, the enhancement
+tables, the pipeline code and every corpus file) together with a copy of
+the last enriched timeline (including the related passages the published
+output leaves out), so a run only redoes the parts whose inputs changed.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict, replace
+from pathlib import Path
+
+from rag_corpus import CorpusDocument, find_phrases_in_corpus, iter_chunks, load_corpus
+
+MANIFEST_VERSION = 4
+MANIFEST_NAME = "manifest.json"
+CACHED_OUTPUT_NAME = "output.json"
+
+# Fields enrich-from-rag.py adds; stripped before hashing a decade's inputs
+ENRICHED_DECADE_FIELDS = ("summary", "key_achievements")
+ENRICHED_WORK_FIELDS = ("enhanced_description", "related_themes", "corpus_sources", "related_passages",
+                        "citation", "annotation")
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hash_json(value):
+    """Stable hash of any JSON-serializable value."""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hash_bytes(encoded.encode("utf-8"))
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    for chunk in iter_chunks(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_sources(paths):
+    """Hash the source of the given files, so code changes invalidate the cache."""
+    return hash_json([Path(path).read_bytes().decode("utf-8") for path in paths])
+
+def write_atomic(path, data):
+    """Write bytes to path through a temporary file and rename."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600 files; keep the mode a plain open() would give
+        if path.exists():
+            os.chmod(temp_path, path.stat().st_mode & 0o777)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def write_if_changed(path, data):
+    """Atomically write data unless path already holds exactly these bytes."""
+    path = Path(path)
+    if path.is_file() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    write_atomic(path, data)
+    return True
+
+
+class Manifest:
+    """The on-disk cache directory: manifest.json plus the last output."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.path = self.cache_dir / MANIFEST_NAME
+        self.output_path = self.cache_dir / CACHED_OUTPUT_NAME
+        self.data = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.data = data
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def cached_output(self):
+        """Bytes of the last output, or None if missing or not the one recorded."""
+        try:
+            data = self.output_path.read_bytes()
+        except OSError:
+            return None
+        return data if hash_bytes(data) == self.data.get("output") else None
+
+    def save(self, data, output_bytes):
+        data = dict(data, version=MANIFEST_VERSION, output=hash_bytes(output_bytes))
+        write_if_changed(self.output_path, output_bytes)
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self.data = data
+
+
+def stat_fingerprint(paths):
+    """Cheap stand-in for the content of many files: each one's size and mtime."""
+    return hash_json([
+        [str(path), stat.st_size, stat.st_mtime_ns]
+        for path in paths
+        for stat in (Path(path).stat(),)
+    ])
+
+def load_corpus_cached(entries, phrases, cached_corpus, workers=None):
+    """
+    Like rag_corpus.load_corpus, but reuses cached_corpus (a previous
+    run's manifest entry) for files whose content hash is unchanged. The
+    entry records the phrases every cached document was checked for, so
+    unchanged documents are only searched for phrases added since, and a
+    new work title does not mean re-ingesting the corpus.
+    Returns (documents, corpus_entry, reingested_count).
+    """
+    entries = list(entries)
+    phrases = list(phrases)
+    order = {phrase: position for position, phrase in enumerate(phrases)}
+    checked = set(cached_corpus.get("phrases", ()))
+    added = [phrase for phrase in phrases if phrase not in checked]
+    cached_files = cached_corpus.get("files", {})
+
+    documents = []
+    stale = []
+    unchanged = []
+    for path, source in entries:
+        entry = cached_files.get(source)
+        stat = Path(path).stat()
+        stat_key = (str(path), stat.st_size, stat.st_mtime_ns)
+        if entry is not None and (entry["path"], entry["size"], entry["mtime_ns"]) != stat_key:
+            # Touched but possibly unchanged: a hash is still far cheaper than re-ingesting
+            if hash_file(path) != entry["document"]["sha256"]:
+                entry = None
+        if entry is None:
+            stale.append((path, source))
+            documents.append(source)
+        else:
+            document = entry["document"]
+            unchanged.append((len(documents), path))
+            documents.append(CorpusDocument(**dict(document, phrases=tuple(
+                phrase for phrase in document["phrases"] if phrase in order))))
+
+    if added and unchanged:
+        found_added = find_phrases_in_corpus([path for _, path in unchanged], added, workers)
+        for (position, _), found in zip(unchanged, found_added):
+            document = documents[position]
+            found_phrases = sorted(set(document.phrases) | found, key=order.get)
+            documents[position] = replace(document, phrases=tuple(found_phrases))
+
+    fresh = {document.source: document for document in load_corpus(stale, phrases, workers)}
+    documents = [fresh[item] if isinstance(item, str) else item for item in documents]
+
+    files = {}
+    for (path, _), document in zip(entries, documents):
+        stat = Path(path).stat()
+        files[document.source] = {
+            "path": str(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "document": asdict(document),
+        }
+    return documents, {"phrases": phrases, "files": files}, len(stale)
+
+def strip_enrichment(timeline):
+    """Remove fields added by a previous enrichment run, in place."""
+    for decade_data in timeline["decades"].values():
+        for field in ENRICHED_DECADE_FIELDS:
+            decade_data.pop(field, None)
+        for works in decade_data.get("categories", {}).values():
+            for work in works:
+                for field in ENRICHED_WORK_FIELDS:
+                    work.pop(field, None)
+    return timeline
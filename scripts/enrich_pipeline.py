@@ -0,0 +1,248 @@
+"""
+Enrichment steps shared by enrich-from-rag.py builds and the in-memory
+rebuilds of --serve (live_timeline.py).
+
+The content (biography, decade summaries, work enhancements) stays in
+enrich-from-rag.py; these functions apply it. They match works to
+enhancement keys, index which corpus documents mention each work, hash
+each decade's inputs so unchanged decades are reused, link works to
+corpus passages and bibliography entries, and shape the published
+outputs. A build keeps the state between runs in the manifest, --serve
+keeps it in memory; both go through the same steps.
+"""
+
+import json
+from pathlib import Path
+
+import pdf_extract
+from enrich_cache import hash_json, load_corpus_cached
+from pdf_extract import extract_pdfs, iter_pdf_files, pdf_corpus_entries
+from rag_corpus import index_phrase_sources, iter_corpus_entries, phrase_key
+from rag_matcher import KeyMatcher
+from rag_retrieval import PassageIndex, index_fingerprint, link_related_passages
+from record_linkage import annotate_works
+from search_index import titles_hash
+
+PASSAGE_INDEX_NAME = "passage-index.npz"
+# Cap on documents listed per work in corpus_sources
+MAX_CORPUS_SOURCES = 25
+RELATED_PASSAGES_VERSION = 1
+
+
+def iter_works(timeline):
+    """Yield (decade_key, category, work) for every work in the timeline."""
+    for decade_key, decade_data in timeline["decades"].items():
+        for category, works in decade_data.get("categories", {}).items():
+            for work in works:
+                yield decade_key, category, work
+
+# --- Corpus ------------------------------------------------------------------
+
+def source_pdfs(pdf_dirs, website_dir):
+    """Source PDFs: those under pdf_dirs, or by default the ones at the top of website_dir."""
+    if pdf_dirs is None:
+        return sorted(Path(website_dir).glob("*.pdf"))
+    return [path for pdf_dir in pdf_dirs for path in iter_pdf_files(pdf_dir)]
+
+def extract_pdf_entries(pdf_paths, cache_dir, source_root, workers=None):
+    """Corpus entries for the extracted text of pdf_paths (empty without pypdf)."""
+    if not pdf_paths:
+        return []
+    if not pdf_extract.available():
+        print(f"  pypdf not installed; skipping {len(pdf_paths)} PDFs")
+        return []
+    text_paths, extracted, failed = extract_pdfs(pdf_paths, cache_dir, workers)
+    for pdf_path, error in failed.items():
+        print(f"  Skipping {pdf_path}: {error}")
+    print(f"  {len(text_paths)} PDFs, {extracted} newly extracted, {len(failed)} unreadable")
+    return pdf_corpus_entries(text_paths, source_root)
+
+def corpus_entries(corpus_dir):
+    """(path, source) of every RAG corpus document; empty if the corpus is missing."""
+    if not Path(corpus_dir).is_dir():
+        return []
+    return list(iter_corpus_entries(corpus_dir))
+
+def load_corpus_index(entries, phrases, workers=None, cached_corpus=None):
+    """
+    Ingest (path, source) documents and map each phrase to the
+    documents containing it. Files unchanged since cached_corpus (the
+    corpus entry of an earlier run) are not re-read. Returns
+    (index, corpus_entry), or (None, None) if there are no documents.
+    """
+    if not entries:
+        print("  No corpus documents; corpus_sources will not be set")
+        return None, None
+
+    documents, corpus_entry, reingested = load_corpus_cached(entries, phrases, cached_corpus or {}, workers)
+    print(f"  {len(documents)} documents, {reingested} new or changed")
+    return index_phrase_sources(documents), corpus_entry
+
+def corpus_files(corpus_entry):
+    """(path, source, sha256) of every document in a load_corpus_index corpus entry."""
+    return [(Path(entry["path"]), source, entry["document"]["sha256"])
+            for source, entry in (corpus_entry or {}).get("files", {}).items()]
+
+def passage_texts(files, bibliography_path, bibliography_hash):
+    """(path, source, sha256) of the annotated bibliography, if any, and every corpus file in files."""
+    texts = []
+    if bibliography_hash is not None:
+        texts.append((bibliography_path, bibliography_path.name, bibliography_hash))
+    texts.extend(files)
+    return texts
+
+def load_passage_index(texts, cache_dir, workers=None, current=None):
+    """
+    The BM25 passage index of (path, source, sha256) texts: current if it
+    was built from them, else the one cached in cache_dir, else a new one.
+    """
+    fingerprint = index_fingerprint([(source, sha256) for _, source, sha256 in texts])
+    if current is not None and current.fingerprint == fingerprint:
+        return current
+    cache_path = Path(cache_dir) / PASSAGE_INDEX_NAME
+    passage_index = PassageIndex.load(cache_path, fingerprint)
+    if passage_index is not None:
+        print(f"  Reused cached passage index ({len(passage_index)} passages, {len(passage_index.terms)} terms)")
+        return passage_index
+
+    passage_index = PassageIndex.build([(path, source) for path, source, _ in texts], fingerprint, workers)
+    passage_index.save(cache_path)
+    print(f"  Built passage index ({len(passage_index)} passages, {len(passage_index.terms)} terms)")
+    return passage_index
+
+# --- Enrichment --------------------------------------------------------------
+
+def build_work_matcher(work_enhancements):
+    """Build the title matcher once for all enhancement keys."""
+    return KeyMatcher(work_enhancements.keys())
+
+def collect_work_phrases(timeline, work_enhancements):
+    """Normalized phrases to look for in the corpus: enhancement keys and work titles."""
+    phrases = {phrase_key(key) for key in work_enhancements}
+    for _, _, work in iter_works(timeline):
+        title = phrase_key(work.get("title", ""))
+        # Single-word titles would match far too many documents
+        if title.strip().count(" ") >= 1:
+            phrases.add(title)
+    phrases.discard("")
+    return sorted(phrases)
+
+def works_input_hash(work_enhancements, bibliography_hash, corpus_index, passage_index, settings):
+    """Hash of everything a work's enrichment depends on besides the work itself."""
+    return hash_json([work_enhancements, bibliography_hash, corpus_index,
+                      passage_index.fingerprint if passage_index is not None else None, settings])
+
+def decade_input_hashes(timeline, decade_summaries, works_hash):
+    """Hash of each decade's inputs: its works, its summary and works_hash."""
+    return {
+        decade_key: hash_json([works_hash, decade_summaries.get(decade_key), decade_data])
+        for decade_key, decade_data in timeline["decades"].items()
+    }
+
+def reuse_decades(timeline, decade_hashes, previous_hashes, previous_decades):
+    """
+    Copy enriched decades whose input hash is unchanged from
+    previous_decades into timeline. Returns the keys of the decades still
+    to enrich.
+    """
+    changed = []
+    for decade_key, digest in decade_hashes.items():
+        if previous_hashes.get(decade_key) == digest and decade_key in previous_decades:
+            timeline["decades"][decade_key] = previous_decades[decade_key]
+        else:
+            changed.append(decade_key)
+    return changed
+
+def find_corpus_sources(title, match_key, corpus_index):
+    """Documents backing a work: those containing its title or its enhancement key."""
+    phrases = [phrase_key(title)]
+    if match_key is not None:
+        phrases.append(phrase_key(match_key))
+    sources = dict.fromkeys(source for phrase in phrases for source in corpus_index.get(phrase, ()))
+    return list(sources)[:MAX_CORPUS_SOURCES]
+
+def apply_enhancements(timeline, decade_summaries, work_enhancements, matcher=None, match_report=None,
+                       corpus_index=None, decade_keys=None):
+    """
+    Apply enhancements to timeline data.
+    If match_report is a list, (decade, category, title, matched_keys) is
+    appended for every work whose title matched at least one key.
+    corpus_index (from load_corpus_index) fills in corpus_sources.
+    decade_keys limits enrichment to those decades.
+    """
+    if matcher is None:
+        matcher = build_work_matcher(work_enhancements)
+
+    # Enhance decades with summaries
+    for decade_key, summary_data in decade_summaries.items():
+        if decade_key in timeline["decades"] and (decade_keys is None or decade_key in decade_keys):
+            timeline["decades"][decade_key]["summary"] = summary_data["summary"]
+            timeline["decades"][decade_key]["key_achievements"] = summary_data["key_achievements"]
+
+    # Enhance individual works
+    for decade_key, category, work in iter_works(timeline):
+        if decade_keys is not None and decade_key not in decade_keys:
+            continue
+        title = work.get("title", "")
+        match_key, matched_keys = matcher.match(title)
+
+        if match_key is not None:
+            enhancement = work_enhancements[match_key]
+            work["enhanced_description"] = enhancement["enhanced_description"]
+            work["related_themes"] = enhancement["related_themes"]
+            if match_report is not None:
+                match_report.append((decade_key, category, title, matched_keys))
+
+        if corpus_index is not None:
+            sources = find_corpus_sources(title, match_key, corpus_index)
+            if sources:
+                work["corpus_sources"] = sources
+
+    return timeline
+
+def link_decade_passages(timeline, decade_keys, passage_index, texts, top_k, min_relative_score):
+    """
+    One batched BM25 scoring pass linking every work in decade_keys to
+    passages of (path, source, sha256) texts. Returns (linked, works).
+    """
+    works = [work for decade_key, _, work in iter_works(timeline) if decade_key in decade_keys]
+    source_paths = {source: path for path, source, _ in texts}
+    return link_related_passages(works, passage_index, source_paths, top_k, min_relative_score), len(works)
+
+def annotate_timeline(timeline, entries):
+    """Link works to bibliography entries; one-to-one across the whole timeline, so every work is relinked."""
+    return annotate_works([work for _, _, work in iter_works(timeline)], entries)
+
+# --- Outputs -----------------------------------------------------------------
+
+def serialize_timeline(timeline):
+    return json.dumps(timeline, indent=2, ensure_ascii=False).encode("utf-8")
+
+def published_timeline(timeline):
+    """
+    The timeline as written to --output: without related_passages, which
+    every page load would otherwise fetch. They go to their own file and
+    to the bodies shards instead.
+    """
+    return dict(timeline, decades={
+        decade_key: dict(decade_data, categories={
+            category: [{field: value for field, value in work.items() if field != "related_passages"}
+                       for work in works]
+            for category, works in decade_data.get("categories", {}).items()
+        })
+        for decade_key, decade_data in timeline["decades"].items()
+    })
+
+def build_related_passages(timeline):
+    """related_passages by work id (search index ids), for loading on demand."""
+    works = [work for _, _, work in iter_works(timeline)]
+    return {
+        "version": RELATED_PASSAGES_VERSION,
+        "works": len(works),
+        "titles_hash": titles_hash(works),
+        "passages": {str(work_id): work["related_passages"]
+                     for work_id, work in enumerate(works) if work.get("related_passages")},
+    }
+
+def serialize_related_passages(related):
+    return json.dumps(related, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,159 @@
+"""
+The enriched timeline kept in memory between rebuilds, for
+enrich-from-rag.py --serve.
+
+A rebuild runs the same enrich_pipeline steps as a build. What a build
+keeps in its manifest is kept in memory instead: the corpus entry (each
+document's content hash and the phrases found in it, never its text),
+the passage index, and every enriched decade with the hash of its
+inputs. A rebuild therefore re-ingests only changed documents, in the
+process pool, searches the rest only for phrases that are new, and
+re-enriches only the decades whose inputs changed.
+
+With --csv the works are rebuilt from the CSV database in-process, as
+build-data.js would, so a CSV edit reaches the page without a Node run.
+"""
+
+import json
+import re
+
+import rag_retrieval
+from enrich_cache import hash_file, stat_fingerprint, strip_enrichment
+from enrich_pipeline import (annotate_timeline, apply_enhancements, build_work_matcher, collect_work_phrases,
+                             corpus_entries, corpus_files, decade_input_hashes, extract_pdf_entries,
+                             link_decade_passages, load_corpus_index, load_passage_index, passage_texts,
+                             reuse_decades, source_pdfs, works_input_hash)
+from record_linkage import load_catalogue, parse_bibliography
+
+# First and last year build-data.js places in a decade
+CATALOGUE_YEARS = (1970, 2025)
+LEADING_INT_RE = re.compile(r"\s*[+-]?\d+")
+
+
+def catalogue_year(value):
+    """The CSV Year as build-data.js reads it (parseInt): the leading integer, or None."""
+    match = LEADING_INT_RE.match(value or "")
+    return int(match.group()) if match else None
+
+def timeline_from_catalogue(rows, skeleton):
+    """
+    The timeline build-data.js would write for CSV rows, in-process.
+    skeleton supplies the biography and the decades and their themes;
+    its works are replaced.
+    """
+    timeline = dict(skeleton, decades={
+        decade_key: dict(decade_data, totalWorks=0, categories={})
+        for decade_key, decade_data in skeleton["decades"].items()
+    })
+    for row in rows:
+        year = catalogue_year(row.get("Year"))
+        if not year or not CATALOGUE_YEARS[0] <= year <= CATALOGUE_YEARS[1]:
+            continue
+        decade_data = timeline["decades"].get(f"{year // 10 * 10}s")
+        if decade_data is None:
+            continue
+        category = row.get("Category") or "Uncategorized"
+        decade_data["categories"].setdefault(category, []).append({
+            "title": row.get("Title") or "Untitled",
+            "year": year,
+            "category": category,
+            "description": row.get("Description") or "",
+            "awards": row.get("Awards_Recognition") or None,
+            "isbn": row.get("ISBN_DOI") or None,
+            "url": row.get("URL") or None,
+            "significance": row.get("Historical_Significance") or None,
+        })
+        decade_data["totalWorks"] += 1
+    return timeline
+
+
+class LiveTimeline:
+    """
+    Rebuilds the enriched timeline on demand, reusing everything whose
+    inputs are unchanged since the last rebuild. args are the parsed
+    enrich-from-rag.py arguments; the content tables come from it too.
+    """
+
+    def __init__(self, args, biography, decade_summaries, work_enhancements, bibliography_path, website_dir):
+        self.args = args
+        self.biography = biography
+        self.decade_summaries = decade_summaries
+        self.work_enhancements = work_enhancements
+        self.bibliography_path = bibliography_path
+        self.website_dir = website_dir
+        self.matcher = build_work_matcher(work_enhancements)
+        self.retrieval_enabled = args.top_k > 0 and rag_retrieval.available()
+        self.pdf_stat = None
+        self.pdf_entries = []
+        self.corpus = None
+        self.passage_index = None
+        self.bibliography_stat = None
+        self.bibliography_hash = None
+        self.bibliography = []
+        self.decade_hashes = {}
+        self.decades = {}
+
+    def watched_paths(self):
+        """Every input file and directory a rebuild reads."""
+        paths = [self.args.timeline, self.bibliography_path, self.args.corpus_dir]
+        if self.args.csv is not None:
+            paths.append(self.args.csv)
+        return paths + (source_pdfs(None, self.website_dir) if self.args.pdf_dirs is None else self.args.pdf_dirs)
+
+    def load_source(self):
+        """The unenriched timeline: --timeline, with its works rebuilt from the CSV if --csv is given."""
+        timeline = strip_enrichment(json.loads(self.args.timeline.read_bytes()))
+        if self.args.csv is not None:
+            timeline = timeline_from_catalogue(load_catalogue(self.args.csv), timeline)
+        timeline["biography"] = self.biography
+        return timeline
+
+    def refresh_pdfs(self):
+        """Re-extract the source PDFs if any of them changed; extract_pdfs keeps unchanged text cached."""
+        pdf_paths = source_pdfs(self.args.pdf_dirs, self.website_dir)
+        pdf_stat = stat_fingerprint(pdf_paths)
+        if pdf_stat != self.pdf_stat:
+            self.pdf_entries = extract_pdf_entries(pdf_paths, self.args.cache_dir, self.website_dir,
+                                                   self.args.workers)
+            self.pdf_stat = pdf_stat
+
+    def refresh_bibliography(self):
+        """Reparse the annotated bibliography if it changed."""
+        path = self.bibliography_path
+        bibliography_stat = stat_fingerprint([path]) if path.is_file() else None
+        if bibliography_stat != self.bibliography_stat:
+            self.bibliography_hash = hash_file(path) if bibliography_stat is not None else None
+            self.bibliography = parse_bibliography(path) if bibliography_stat is not None else []
+            self.bibliography_stat = bibliography_stat
+
+    def rebuild(self):
+        """Return (enriched timeline, keys of the decades re-enriched)."""
+        timeline = self.load_source()
+        self.refresh_pdfs()
+        self.refresh_bibliography()
+
+        entries = corpus_entries(self.args.corpus_dir) + self.pdf_entries
+        phrases = collect_work_phrases(timeline, self.work_enhancements)
+        corpus_index, self.corpus = load_corpus_index(entries, phrases, self.args.workers, self.corpus)
+
+        texts = passage_texts(corpus_files(self.corpus), self.bibliography_path, self.bibliography_hash)
+        if self.retrieval_enabled:
+            self.passage_index = load_passage_index(texts, self.args.cache_dir, self.args.workers,
+                                                    self.passage_index)
+
+        works_hash = works_input_hash(self.work_enhancements, self.bibliography_hash, corpus_index,
+                                      self.passage_index, [self.args.top_k, self.args.min_passage_score])
+        decade_hashes = decade_input_hashes(timeline, self.decade_summaries, works_hash)
+        changed_decades = reuse_decades(timeline, decade_hashes, self.decade_hashes, self.decades)
+
+        timeline = apply_enhancements(timeline, self.decade_summaries, self.work_enhancements, self.matcher,
+                                      corpus_index=corpus_index, decade_keys=changed_decades)
+        if self.passage_index is not None and changed_decades:
+            link_decade_passages(timeline, changed_decades, self.passage_index, texts,
+                                 self.args.top_k, self.args.min_passage_score)
+        if self.bibliography_hash is not None:
+            annotate_timeline(timeline, self.bibliography)
+
+        self.decade_hashes = decade_hashes
+        self.decades = dict(timeline["decades"])
+        return timeline, changed_decades
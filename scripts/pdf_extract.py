@@ -0,0 +1,166 @@
+"""
+Parallel, cached text extraction for source PDFs.
+
+Each PDF is split into page ranges that a process pool extracts
+independently; pypdf parses pages lazily, so a worker only touches the
+pages it was given. The text is cached under the PDF's content hash, so
+an unchanged PDF is never parsed again, and the cached text files are
+fed to corpus ingestion like any other corpus document.
+
+A PDF that cannot be read (truncated, corrupt or encrypted) is reported
+and left out of the run. Its error is cached under its content hash like
+text would be, so it is not parsed again until the file changes.
+
+Needs pypdf; without it available() is False and PDFs are skipped.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+
+from enrich_cache import hash_file, write_atomic
+
+try:
+    from pypdf import PdfReader
+    from pypdf.errors import PyPdfError
+except ImportError:
+    PdfReader = None
+    PyPdfError = OSError
+
+# pypdf warns about every font it cannot fully decode; the text is still usable
+logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+# What pypdf raises for a damaged file: PdfReadError and its other
+# PyPdfErrors, and OSError or ValueError from reading the stream
+PDF_ERRORS = (PyPdfError, OSError, ValueError)
+
+PAGES_PER_TASK = 8
+TEXT_CACHE_DIR = "pdf-text"
+HASH_INDEX_NAME = "hashes.json"
+
+
+def available():
+    return PdfReader is not None
+
+def iter_pdf_files(directory):
+    """Yield PDFs under directory in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".pdf"):
+                yield Path(dirpath) / filename
+
+def describe_error(error):
+    return f"{type(error).__name__}: {error}"
+
+def extract_page_range(task):
+    """(path, start, texts, error) for pages [start, end) of one PDF; texts is None on error."""
+    path, start, end = task
+    try:
+        reader = PdfReader(path)
+        texts = [reader.pages[number].extract_text() for number in range(start, end)]
+    except PDF_ERRORS as e:
+        return path, start, None, describe_error(e)
+    return path, start, [text or "" for text in texts], None
+
+def _iter_results(tasks, workers):
+    if not tasks:
+        return
+    if workers == 1:
+        for task in tasks:
+            yield extract_page_range(task)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(extract_page_range, tasks)
+
+def extract_pdfs(pdf_paths, cache_dir, workers=None):
+    """
+    Make sure the text, or the parse error, of every PDF is in the cache.
+    Returns ({pdf_path: text_path}, extracted_count, {pdf_path: error});
+    PDFs that fail to parse are only in the last.
+    """
+    text_dir = Path(cache_dir) / TEXT_CACHE_DIR
+    text_dir.mkdir(parents=True, exist_ok=True)
+
+    # Remember each PDF's hash by size and mtime so large archives are not re-hashed every run
+    hash_index_path = text_dir / HASH_INDEX_NAME
+    try:
+        with open(hash_index_path, "r", encoding="utf-8") as f:
+            hash_index = json.load(f)
+    except (OSError, ValueError):
+        hash_index = {}
+
+    text_paths = {}
+    error_paths = {}
+    failed = {}
+    new_hash_index = {}
+    pending = []
+    for path in pdf_paths:
+        stat = path.stat()
+        known = hash_index.get(str(path))
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            digest = known[2]
+        else:
+            digest = hash_file(path)
+        new_hash_index[str(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+        text_paths[path] = text_dir / f"{digest}.txt"
+        error_paths[path] = text_dir / f"{digest}.error"
+        if error_paths[path].exists():
+            failed[path] = error_paths[path].read_text(encoding="utf-8")
+        elif not text_paths[path].exists():
+            pending.append(path)
+
+    def fail(path, error):
+        failed[path] = error
+        write_atomic(error_paths[path], error.encode("utf-8"))
+
+    tasks = []
+    pages = {}
+    for path in pending:
+        try:
+            page_count = len(PdfReader(path).pages)
+        except PDF_ERRORS as e:
+            fail(path, describe_error(e))
+            continue
+        pages[str(path)] = [None] * page_count
+        tasks.extend((str(path), start, min(start + PAGES_PER_TASK, page_count))
+                     for start in range(0, page_count, PAGES_PER_TASK))
+        if page_count == 0:
+            write_atomic(text_paths[path], b"")
+
+    remaining = {path: len(texts) for path, texts in pages.items()}
+    for path, start, texts, error in _iter_results(tasks, workers):
+        if path not in pages:
+            continue  # an earlier range of this PDF already failed
+        if error is not None:
+            fail(Path(path), error)
+            del pages[path]
+            continue
+        pages[path][start:start + len(texts)] = texts
+        remaining[path] -= len(texts)
+        if remaining[path] == 0:
+            # Blank lines between pages keep them separate paragraphs for passage splitting
+            text = "\n\n".join(pages.pop(path))
+            write_atomic(text_paths[Path(path)], text.encode("utf-8"))
+
+    # Drop text and errors cached for PDFs that are gone or have changed
+    live = {error_paths[path].name if path in failed else text_paths[path].name for path in text_paths}
+    for cached in [*text_dir.glob("*.txt"), *text_dir.glob("*.error")]:
+        if cached.name not in live:
+            cached.unlink()
+    write_atomic(hash_index_path, json.dumps(new_hash_index).encode("utf-8"))
+    extracted = sum(1 for path in pending if path not in failed)
+    return {path: text_path for path, text_path in text_paths.items() if path not in failed}, extracted, failed
+
+def pdf_corpus_entries(text_paths, source_root):
+    """(text_path, source) entries for rag_corpus.load_corpus; sources are PDF paths."""
+    entries = []
+    for pdf_path, text_path in text_paths.items():
+        try:
+            source = pdf_path.relative_to(source_root).as_posix()
+        except ValueError:
+            source = pdf_path.as_posix()
+        entries.append((text_path, source))
+    return entries
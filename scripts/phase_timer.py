@@ -0,0 +1,72 @@
+"""
+Per-phase wall time and peak memory for enrich-from-rag.py runs.
+
+A PhaseTimer is lapped at the end of each phase; each lap records the
+time since the previous one and the process's peak resident memory so
+far. results() is the machine-readable form benchmark-build.py collects.
+
+Peak memory comes from the resource module and is None where that is
+unavailable (Windows).
+"""
+
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RESULTS_VERSION = 1
+
+
+def peak_rss_bytes(who="self"):
+    """Peak resident memory of this process ("self") or its finished workers ("children")."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+def format_bytes(size):
+    if size is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class PhaseTimer:
+    """Stopwatch whose laps name the phase that just finished."""
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.phases = []
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.phases.append({"phase": name, "seconds": now - self.last, "peak_rss_bytes": peak_rss_bytes()})
+        self.last = now
+
+    def results(self, **info):
+        """Phases, totals and any extra info as a JSON-serializable dict."""
+        return dict(info, version=RESULTS_VERSION, phases=self.phases,
+                    total_seconds=time.perf_counter() - self.started,
+                    peak_rss_bytes=peak_rss_bytes(), peak_children_rss_bytes=peak_rss_bytes("children"))
+
+    def report(self):
+        results = self.results()
+        lines = ["\n=== Phase Timings ===", f"{'phase':<14} {'seconds':>9} {'peak memory':>12}"]
+        for phase in self.phases:
+            lines.append(f"{phase['phase']:<14} {phase['seconds']:>9.3f} {format_bytes(phase['peak_rss_bytes']):>12}")
+        lines.append(f"{'total':<14} {results['total_seconds']:>9.3f} {format_bytes(results['peak_rss_bytes']):>12}")
+        if results["peak_children_rss_bytes"]:
+            lines.append(f"Worker processes peaked at {format_bytes(results['peak_children_rss_bytes'])}")
+        return "\n".join(lines)
+
+    def write(self, path, **info):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.results(**info), f, indent=2)
+            f.write("\n")
@@ -0,0 +1,202 @@
+"""
+Streaming loader for the dr-cortes-rag-corpus directory.
+
+Walks extracted/ (blog_posts/ and the other subfolders) lazily, reads each
+document in fixed-size chunks (through mmap for large files), and fans
+normalization, tokenization and phrase matching out over a process pool.
+Only a small per-document summary is kept, never the document text, so
+memory stays bounded however large the corpus grows.
+"""
+
+import codecs
+import hashlib
+import mmap
+import multiprocessing
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+
+from rag_matcher import KeyMatcher
+
+EXTRACTED_DIR = "extracted"
+TEXT_SUFFIXES = (".txt", ".md")
+CHUNK_SIZE = 1 << 20          # bytes decoded and tokenized at a time
+MMAP_THRESHOLD = 4 << 20      # files at least this big are mapped, not read
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['’][a-z0-9]+)*")
+TRAILING_WORD_RE = re.compile(r"[\w'’]*$")
+
+
+@dataclass(frozen=True)
+class CorpusDocument:
+    source: str          # e.g. "dr-cortes-rag-corpus/extracted/blog_posts/post.txt"
+    sha256: str
+    phrases: tuple       # normalized phrases found in the document
+
+
+def normalize_text(text):
+    """Lowercase and strip accents so 'Gaúcho' and 'gaucho' compare equal."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+def tokenize(text):
+    """Split text into normalized word tokens."""
+    return TOKEN_RE.findall(normalize_text(text))
+
+def phrase_key(text):
+    """
+    Normalized, space-delimited form of a phrase. The padding makes
+    substring matches against a token stream fall on word boundaries.
+    """
+    tokens = tokenize(text)
+    return f" {' '.join(tokens)} " if tokens else ""
+
+def iter_corpus_files(corpus_dir):
+    """Yield text files under corpus_dir/extracted in a stable order."""
+    root = Path(corpus_dir) / EXTRACTED_DIR
+    if not root.is_dir():
+        root = Path(corpus_dir)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(TEXT_SUFFIXES):
+                yield Path(dirpath) / filename
+
+def source_name(path, corpus_dir):
+    """Corpus-relative name of a document, prefixed with the corpus folder."""
+    corpus_dir = Path(corpus_dir)
+    return (Path(corpus_dir.name) / Path(path).relative_to(corpus_dir)).as_posix()
+
+def iter_corpus_entries(corpus_dir):
+    """Yield (path, source) for every text file in the corpus."""
+    corpus_dir = Path(corpus_dir)
+    for path in iter_corpus_files(corpus_dir):
+        yield path, source_name(path, corpus_dir)
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yield the raw bytes of path in chunks, mapping large files."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, "rb") as f:
+        if size < MMAP_THRESHOLD:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, size, chunk_size):
+                yield mapped[offset:offset + chunk_size]
+
+def ingest_document(entry, matcher):
+    """Tokenize one (path, source) document and record which matcher phrases it contains."""
+    path, source = entry
+
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    state, found = matcher.scan(" ")
+    carry = ""
+
+    def feed(text):
+        nonlocal state
+        words = tokenize(text)
+        if words:
+            state, _ = matcher.scan(" ".join(words) + " ", state, found)
+
+    for chunk in iter_chunks(path):
+        digest.update(chunk)
+        text = carry + decoder.decode(chunk)
+        # Hold back a trailing partial word until the next chunk arrives
+        split = TRAILING_WORD_RE.search(text).start()
+        text, carry = text[:split], text[split:]
+        feed(text)
+    feed(carry + decoder.decode(b"", final=True))
+
+    return CorpusDocument(
+        source=source,
+        sha256=digest.hexdigest(),
+        phrases=tuple(matcher.keys[index] for index in sorted(found)),
+    )
+
+
+# Per-process state so the automaton is built once per worker, not per task
+_worker_state = {}
+
+def _init_worker(phrases):
+    _worker_state["matcher"] = KeyMatcher(phrases)
+
+def _ingest_in_worker(entry):
+    return ingest_document(entry, _worker_state["matcher"])
+
+def load_corpus(entries, phrases, workers=None):
+    """
+    Yield a CorpusDocument for every (path, source) entry, e.g.
+    from iter_corpus_entries(). phrases should already be normalized with
+    phrase_key(). workers=1 ingests in-process; otherwise a pool of that
+    many processes is used (default: one per core).
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    phrases = list(phrases)
+    if workers == 1:
+        matcher = KeyMatcher(phrases)
+        for entry in entries:
+            yield ingest_document(entry, matcher)
+        return
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(phrases,)) as pool:
+        yield from pool.imap(_ingest_in_worker, entries, chunksize=8)
+
+def find_phrases(task):
+    """
+    Which of phrases occur in one document, for a (path, phrases) task.
+    Cheaper than ingest_document when only a few phrases are new: each
+    chunk's token stream is searched with plain substring tests.
+    """
+    path, phrases = task
+    if not phrases:
+        return set()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    overlap = max(map(len, phrases), default=0)
+    tail = " "
+    carry = ""
+    found = set()
+
+    def search(text):
+        nonlocal tail
+        words = tokenize(text)
+        if words:
+            window = tail + " ".join(words) + " "
+            found.update(phrase for phrase in phrases if phrase not in found and phrase in window)
+            # Keep enough of the stream for a phrase spanning two chunks
+            tail = window[-overlap:]
+
+    for chunk in iter_chunks(path):
+        text = carry + decoder.decode(chunk)
+        split = TRAILING_WORD_RE.search(text).start()
+        text, carry = text[:split], text[split:]
+        search(text)
+    search(carry + decoder.decode(b"", final=True))
+    return found
+
+def find_phrases_in_corpus(paths, phrases, workers=None):
+    """Yield the set of phrases found in each of paths, in order; workers as for load_corpus."""
+    tasks = [(path, list(phrases)) for path in paths]
+    if not tasks:
+        return
+    if workers == 1:
+        yield from map(find_phrases, tasks)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap(find_phrases, tasks, chunksize=8)
+
+def index_phrase_sources(documents):
+    """Map each matched phrase to the sources of the documents containing it."""
+    index = {}
+    for document in documents:
+        for phrase in document.phrases:
+            index.setdefault(phrase, []).append(document.source)
+    return index
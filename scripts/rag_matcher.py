@@ -0,0 +1,95 @@
+"""
+Multi-pattern key matcher for enrich-from-rag.py.
+
+Builds an Aho-Corasick automaton over the enhancement match keys once, so
+each work title is scanned in a single pass no matter how many keys exist.
+"""
+
+from collections import deque
+
+# Which key wins when a title contains more than one
+MATCH_FIRST = "first"      # earliest key in table order (historical behaviour)
+MATCH_LONGEST = "longest"  # longest key, ties broken by table order
+
+
+class KeyMatcher:
+    """Aho-Corasick automaton over a fixed, ordered list of keys, matched case-insensitively."""
+
+    def __init__(self, keys, policy=MATCH_FIRST):
+        if policy not in (MATCH_FIRST, MATCH_LONGEST):
+            raise ValueError(f"Unknown match policy: {policy}")
+        # Matches report the keys as given, so callers can look them up in their own tables
+        self.keys = list(keys)
+        self.policy = policy
+
+        # State 0 is the root; each state has goto edges, a failure link
+        # and the indices of the keys that end there.
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for index, key in enumerate(self.keys):
+            key = key.lower()
+            if not key:
+                continue
+            state = 0
+            for char in key:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._out[state] += (index,)
+
+        # Breadth-first pass so every failure target is final before use
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target
+                self._out[next_state] += self._out[target]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def scan(self, text, state=0, found=None):
+        """
+        Feed text through the automaton and collect matching key indices.
+        Returns (state, found) so long inputs can be scanned in chunks.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        if found is None:
+            found = set()
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return state, found
+
+    def find_all(self, text):
+        """Return every key contained in text, in table order."""
+        _, found = self.scan(text.lower())
+        return [self.keys[index] for index in sorted(found)]
+
+    def match(self, text):
+        """
+        Return (winning_key, all_matched_keys) for text.
+        winning_key is None when nothing matched.
+        """
+        matched = self.find_all(text)
+        if not matched:
+            return None, matched
+        if self.policy == MATCH_LONGEST:
+            # max() keeps the first of equal-length keys, i.e. table order
+            return max(matched, key=len), matched
+        return matched[0], matched
@@ -0,0 +1,293 @@
+"""
+BM25 retrieval linking works to passages of the RAG corpus and the
+annotated bibliography.
+
+Texts are split into passages (paragraphs, short ones merged forward and
+long ones windowed) in a process pool, leaving out section banners: rule
+lines, the titles they frame and all-caps heading lines. Passages become a sparse
+passage-by-term matrix of BM25 weights, and every work's title and
+description are scored against it with one sparse matrix product.
+A hit is kept if it reaches a fraction of the best score its query could
+attain, which, unlike a raw BM25 cutoff, does not drift with the corpus
+size or favour long descriptions over short ones.
+The matrix, vocabulary and IDF are cached keyed by the content hashes of
+the texts, so an unchanged corpus is never re-tokenized.
+
+Needs numpy and scipy; without them available() is False and the
+enrichment step skips retrieval.
+"""
+
+import io
+import multiprocessing
+import re
+from array import array
+from collections import Counter
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+from enrich_cache import hash_json, write_atomic
+from rag_corpus import iter_chunks, tokenize
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+MIN_PASSAGE_TOKENS = 40
+MAX_PASSAGE_TOKENS = 200
+EXCERPT_CHARS = 280
+# Fraction of a query's attainable score a hit needs; below it, hits share
+# only generic words ("Cortés", "diversity", "media") with the work
+MIN_RELATIVE_SCORE = 0.25
+MAX_HEADING_CHARS = 80
+INDEX_VERSION = 2
+
+PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+RAW_WORD_RE = re.compile(r"[^\W_]+(?:['’][^\W_]+)*")
+WHITESPACE_RE = re.compile(r"\s+")
+RULE_LINE_RE = re.compile(r"[=\-_*#~]{3,}")
+CAPS_LINE_RE = re.compile(r"[^a-z]*[A-Z]{2}[^a-z]*")
+
+
+def available():
+    return sparse is not None
+
+def read_text(path):
+    return b"".join(iter_chunks(path)).decode("utf-8", errors="replace")
+
+def blank_headings(text):
+    """
+    text with section banners replaced by newlines, so offsets still
+    point into the original: rule lines ("====..."), a title framed by
+    rules or underlined by one, and short all-caps lines.
+    """
+    lines = text.splitlines(keepends=True)
+    stripped = [line.strip() for line in lines]
+    rules = {number for number, line in enumerate(stripped) if RULE_LINE_RE.fullmatch(line)}
+
+    def is_heading(number):
+        line = stripped[number]
+        if number in rules:
+            return True
+        if not line:
+            return False
+        if number + 1 in rules and (number - 1 in rules or number == 0 or not stripped[number - 1]):
+            return True
+        return len(line) <= MAX_HEADING_CHARS and CAPS_LINE_RE.fullmatch(line) is not None
+
+    return "".join("\n" * len(line) if is_heading(number) else line for number, line in enumerate(lines))
+
+def split_passages(text):
+    """
+    Yield (start, end, tokens) passages of text. Paragraphs shorter than
+    MIN_PASSAGE_TOKENS are merged into the next one (so a bibliography
+    citation stays with its annotation) and long ones are windowed.
+    """
+    text = blank_headings(text)
+    pending = []  # (token, start, end)
+
+    def emit(tokens):
+        return tokens[0][1], tokens[-1][2], [token for token, _, _ in tokens]
+
+    position = 0
+    breaks = [(match.start(), match.end()) for match in PARAGRAPH_BREAK_RE.finditer(text)]
+    for paragraph_end, next_start in breaks + [(len(text), len(text))]:
+        for match in RAW_WORD_RE.finditer(text, position, paragraph_end):
+            for token in tokenize(match.group()):
+                pending.append((token, match.start(), match.end()))
+                if len(pending) == MAX_PASSAGE_TOKENS:
+                    yield emit(pending)
+                    pending = []
+        position = next_start
+
+        if len(pending) >= MIN_PASSAGE_TOKENS:
+            yield emit(pending)
+            pending = []
+    if pending:
+        yield emit(pending)
+
+def document_passages(item):
+    """(source, start, end, tokens) for every passage of one (path, source) text."""
+    path, source = item
+    return [(source, start, end, tokens) for start, end, tokens in split_passages(read_text(path))]
+
+def iter_passages(items, workers=None):
+    """Yield passages of every (path, source) item, split in a process pool."""
+    items = list(items)
+    if not items:
+        return
+    if workers == 1:
+        for item in items:
+            yield from document_passages(item)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        for passages in pool.imap(document_passages, items, chunksize=8):
+            yield from passages
+
+def index_fingerprint(sources):
+    """Identity of an index built from (source, sha256) pairs with these parameters."""
+    return hash_json([INDEX_VERSION, BM25_K1, BM25_B, MIN_PASSAGE_TOKENS, MAX_PASSAGE_TOKENS, sorted(sources)])
+
+
+class PassageIndex:
+    """BM25-weighted passage-by-term matrix with its vocabulary and IDF."""
+
+    def __init__(self, fingerprint, terms, idf, matrix, sources, passage_sources, starts, ends):
+        self.fingerprint = fingerprint
+        self.terms = list(terms)
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        self.idf = idf
+        self.matrix = matrix
+        self.sources = list(sources)
+        self.passage_sources = passage_sources
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @classmethod
+    def build(cls, items, fingerprint, workers=None):
+        """Build from (path, source) items."""
+        return cls.from_passages(iter_passages(items, workers), fingerprint)
+
+    @classmethod
+    def from_passages(cls, passages, fingerprint):
+        """Build from (source, start, end, tokens) passages, e.g. from document_passages()."""
+        term_ids = {}
+        source_ids = {}
+        rows, cols, counts = array("q"), array("q"), array("d")
+        lengths, passage_sources, starts, ends = array("d"), array("q"), array("q"), array("q")
+
+        for row, (source, start, end, tokens) in enumerate(passages):
+            for token, count in Counter(tokens).items():
+                rows.append(row)
+                cols.append(term_ids.setdefault(token, len(term_ids)))
+                counts.append(count)
+            lengths.append(len(tokens))
+            passage_sources.append(source_ids.setdefault(source, len(source_ids)))
+            starts.append(start)
+            ends.append(end)
+
+        rows, cols, counts = np.frombuffer(rows, np.int64), np.frombuffer(cols, np.int64), np.frombuffer(counts)
+        lengths = np.frombuffer(lengths)
+        passage_count, term_count = len(lengths), len(term_ids)
+
+        # Non-negative BM25 IDF; each (row, col) pair is unique, so bincount gives document frequency
+        document_frequency = np.bincount(cols, minlength=term_count)
+        idf = np.log1p((passage_count - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = lengths.mean() if passage_count else 0.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / max(average_length, 1.0))
+        weights = idf[cols] * counts * (BM25_K1 + 1) / (counts + norm)
+        matrix = sparse.csr_matrix((weights, (rows, cols)), shape=(passage_count, term_count))
+
+        terms = sorted(term_ids, key=term_ids.get)
+        sources = sorted(source_ids, key=source_ids.get)
+        return cls(fingerprint, terms, idf, matrix, sources, np.frombuffer(passage_sources, np.int64),
+                   np.frombuffer(starts, np.int64), np.frombuffer(ends, np.int64))
+
+    def save(self, path):
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            fingerprint=np.array(self.fingerprint),
+            terms=np.array(self.terms, dtype=str),
+            idf=self.idf,
+            data=self.matrix.data, indices=self.matrix.indices, indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape),
+            sources=np.array(self.sources, dtype=str),
+            passage_sources=self.passage_sources, starts=self.starts, ends=self.ends,
+        )
+        write_atomic(path, buffer.getvalue())
+
+    @classmethod
+    def load(cls, path, fingerprint):
+        """The cached index at path, or None if missing or built from other inputs."""
+        try:
+            with np.load(path) as cached:
+                if str(cached["fingerprint"]) != fingerprint:
+                    return None
+                matrix = sparse.csr_matrix((cached["data"], cached["indices"], cached["indptr"]),
+                                           shape=tuple(cached["shape"]))
+                return cls(fingerprint, cached["terms"].tolist(), cached["idf"], matrix,
+                           cached["sources"].tolist(), cached["passage_sources"], cached["starts"], cached["ends"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def query_matrix(self, queries):
+        """Binary query-by-term matrix for lists of query tokens."""
+        rows, cols = [], []
+        for row, tokens in enumerate(queries):
+            for term_id in {self.term_ids[token] for token in tokens if token in self.term_ids}:
+                rows.append(row)
+                cols.append(term_id)
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(queries), len(self.terms)))
+
+    def max_scores(self, queries):
+        """
+        The best score each query could reach: every distinct known term
+        at its full weight, idf * (k1 + 1), the BM25 limit as tf grows.
+        """
+        return self.query_matrix(queries) @ (self.idf * (BM25_K1 + 1))
+
+    def top_passages(self, queries, top_k, batch_size=4096):
+        """
+        Score every query against every passage and return, per query,
+        up to top_k (passage_index, score) pairs, best first.
+        """
+        results = []
+        passage_terms = self.matrix.T.tocsr()
+        for offset in range(0, len(queries), batch_size):
+            scores = (self.query_matrix(queries[offset:offset + batch_size]) @ passage_terms).tocsr()
+            for row in range(scores.shape[0]):
+                start, end = scores.indptr[row], scores.indptr[row + 1]
+                data, indices = scores.data[start:end], scores.indices[start:end]
+                if len(data) > top_k:
+                    best = np.argpartition(-data, top_k - 1)[:top_k]
+                    data, indices = data[best], indices[best]
+                order = np.lexsort((indices, -data))
+                results.append([(int(indices[i]), float(data[i])) for i in order if data[i] > 0])
+        return results
+
+    def source_of(self, passage_index):
+        return self.sources[self.passage_sources[passage_index]]
+
+    def excerpt(self, passage_index, text):
+        """Passage text from its document's full text, trimmed to EXCERPT_CHARS."""
+        passage = WHITESPACE_RE.sub(" ", text[self.starts[passage_index]:self.ends[passage_index]]).strip()
+        if len(passage) <= EXCERPT_CHARS:
+            return passage
+        return passage[:EXCERPT_CHARS].rsplit(" ", 1)[0] + "…"
+
+
+def link_related_passages(works, passage_index, source_paths, top_k, min_relative_score=MIN_RELATIVE_SCORE):
+    """
+    Attach the top_k passages for each work's title and description as
+    work["related_passages"], keeping those that score at least
+    min_relative_score (0-1) of the most the query could score.
+    source_paths maps index sources to files.
+    """
+    queries = [tokenize(f"{work.get('title', '')} {work.get('description', '')}") for work in works]
+    max_scores = passage_index.max_scores(queries)
+    texts = {}
+    linked = 0
+    for work, hits, max_score in zip(works, passage_index.top_passages(queries, top_k), max_scores):
+        hits = [(passage, score) for passage, score in hits if score >= min_relative_score * max_score]
+        if not hits:
+            continue
+        related = []
+        for passage, score in hits:
+            source = passage_index.source_of(passage)
+            if source not in texts:
+                # Merged passages may span a banner; keep it out of the excerpt too
+                texts[source] = blank_headings(read_text(source_paths[source]))
+            related.append({
+                "source": source,
+                "score": round(score, 3),
+                "excerpt": passage_index.excerpt(passage, texts[source]),
+            })
+        work["related_passages"] = related
+        linked += 1
+    return linked
@@ -0,0 +1,477 @@
+"""
+Record linkage between the CSV database and the APA7 annotated bibliography.
+
+Both files describe overlapping works. Entries are linked in two passes:
+1. Exact identifier keys: ISBNs (normalized to ISBN-13) and DOIs.
+2. Titles, for everything still unlinked. A blocking index over title
+   words (with prefix filtering, see TitleBlocker) proposes candidate
+   pairs, so only titles sharing a rare word are compared, never all
+   pairs, and each candidate is scored by character trigram similarity.
+
+Links are one-to-one, best score first. The result is one merged record
+per work with the bibliography citation and annotation attached, and a
+report of conflicting fields and of likely duplicates within each source.
+
+Usage: python record_linkage.py [--csv PATH] [--bibliography PATH]
+                                [--output PATH] [--report PATH]
+"""
+
+import argparse
+import csv
+import json
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+from enrich_cache import write_if_changed
+from rag_corpus import tokenize
+
+WEBSITE_DIR = Path(__file__).parent.parent
+CSV_PATH = WEBSITE_DIR / "Dr_Carlos_Cortes_Comprehensive_Database.csv"
+BIBLIOGRAPHY_PATH = WEBSITE_DIR / "Dr_Carlos_Cortes_Annotated_Bibliography_APA7.txt"
+# Review output for maintainers, not the site: kept out of assets/ and out of git
+LINKAGE_DIR = Path(__file__).parent / "linkage"
+MERGED_PATH = LINKAGE_DIR / "merged-works.json"
+REPORT_PATH = LINKAGE_DIR / "linkage-report.json"
+
+SHINGLE_SIZE = 3
+BLOCKING_THRESHOLD = 0.3     # lowest word Jaccard a title pair can have and still be compared
+MATCH_THRESHOLD = 0.45       # title similarity needed to link a CSV row to an entry
+DUPLICATE_THRESHOLD = 0.8    # title similarity flagging two records of one source as duplicates
+
+SECTION_RULE_RE = re.compile(r"^=+$")
+# Cross-references ("[See Cortés, C. E. (2025). ...]") start with a bracket and are not entries
+CITATION_RE = re.compile(r"^(?P<authors>[^\s\[].{0,150}?\.(?:\s\(Eds?\.\)\.)?)\s\((?P<date>[^()]+)\)\.\s+(?P<rest>.+)$")
+ITALIC_TITLE_RE = re.compile(r"^\*(?P<title>[^*]+)\*")
+TITLE_END_RE = re.compile(r"\.\s+(?:\*|In\s)|\s\[")
+ISBN_RE = re.compile(r"ISBN(?:-1[03])?:?\s*([0-9][0-9Xx-]{8,16})")
+BARE_ISBN_RE = re.compile(r"^(?:97[89]-?)?[0-9][0-9-]{7,14}[0-9Xx]$")
+DOI_RE = re.compile(r"\b10\.\d{4,9}/[^\s\"<>]+")
+URL_RE = re.compile(r"https?://\S+")
+YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+
+
+@dataclass(frozen=True)
+class BibliographyEntry:
+    section: str
+    authors: str
+    date: str
+    title: str
+    citation: str
+    annotation: str
+    urls: tuple
+    isbns: tuple         # ISBN-13
+    dois: tuple          # lowercase
+
+
+@dataclass(frozen=True)
+class LinkKeys:
+    """What linkage compares for one record of either source."""
+    title: str
+    year: int            # None when the record has no single year
+    isbns: frozenset
+    dois: frozenset
+    words: frozenset     # normalized title words, for blocking
+    shingles: frozenset  # title trigrams, for scoring
+
+
+# --- Identifiers -----------------------------------------------------------
+
+def isbn13(value):
+    """ISBN-13 form of an ISBN-10 or ISBN-13, or None if value is not one."""
+    digits = re.sub(r"[^0-9Xx]", "", value).upper()
+    if len(digits) == 10 and digits[:9].isdigit():
+        digits = "978" + digits[:9]
+    elif len(digits) != 13 or not digits.isdigit():
+        return None
+    check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits[:12])) % 10) % 10
+    return digits[:12] + str(check)
+
+def extract_isbns(text):
+    return [isbn for isbn in (isbn13(value) for value in ISBN_RE.findall(text)) if isbn]
+
+def extract_dois(text):
+    return [doi.rstrip(".,;)").lower() for doi in DOI_RE.findall(text)]
+
+def parse_year(value):
+    """The first year in value, e.g. 1971 for 'Fall 1971'; decades like '1970s' give None."""
+    years = YEAR_RE.findall(value or "")
+    return int(years[0]) if years else None
+
+
+# --- Parsing ---------------------------------------------------------------
+
+def citation_title(rest):
+    """Work title from the part of a citation after the date."""
+    italic = ITALIC_TITLE_RE.match(rest)
+    if italic:
+        return italic.group("title").strip()
+    end = TITLE_END_RE.search(rest)
+    if end:
+        return rest[:end.start()].strip().rstrip(".")
+    # Otherwise the title runs to the end, less a one-word publisher ("... Cortés. YouTube.")
+    title = rest.rstrip(".")
+    head, _, tail = title.rpartition(". ")
+    return head if head and " " not in tail else title
+
+def parse_bibliography(path=BIBLIOGRAPHY_PATH):
+    """
+    Parse the annotated bibliography into BibliographyEntry records. An
+    entry is an APA7 citation line, its indented detail lines (URLs,
+    publisher notes) and the annotation paragraph that follows.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    entries = []
+    section = ""
+    current = None
+
+    def finish():
+        if current is None:
+            return
+        text = "\n".join([current["citation"]] + current["details"])
+        entries.append(BibliographyEntry(
+            section=section,
+            authors=current["authors"],
+            date=current["date"],
+            title=citation_title(current["rest"]),
+            citation=current["citation"],
+            annotation=" ".join(current["annotation"]),
+            urls=tuple(URL_RE.findall(text)),
+            isbns=tuple(dict.fromkeys(extract_isbns(text))),
+            dois=tuple(dict.fromkeys(extract_dois(text))),
+        ))
+
+    for number, line in enumerate(lines):
+        if SECTION_RULE_RE.match(line):
+            # A section title sits between two rules
+            following = lines[number + 1] if number + 1 < len(lines) else ""
+            if following and not SECTION_RULE_RE.match(following):
+                finish()
+                current = None
+                section = following.strip()
+            continue
+        if current is not None and line.strip() == section:
+            continue
+
+        citation = CITATION_RE.match(line)
+        if citation:
+            finish()
+            current = dict(citation.groupdict(), citation=line.strip(), details=[], annotation=[])
+        elif current is not None and line.startswith((" ", "\t")) and line.strip():
+            current["details"].append(line.strip())
+        elif current is not None and line.strip():
+            current["annotation"].append(line.strip())
+    finish()
+    return entries
+
+def load_catalogue(path=CSV_PATH):
+    """Rows of the CSV database as dicts."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+# --- Keys ------------------------------------------------------------------
+
+def title_shingles(title):
+    """Character trigrams of the normalized title."""
+    text = " ".join(tokenize(title))
+    if len(text) <= SHINGLE_SIZE:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1))
+
+def make_keys(title, year, identifier_text):
+    isbns = set(extract_isbns(identifier_text))
+    # The CSV keeps bare ISBN-10s in its ISBN_DOI column
+    for value in identifier_text.split():
+        if BARE_ISBN_RE.match(value) and isbn13(value):
+            isbns.add(isbn13(value))
+    return LinkKeys(title, year, frozenset(isbns), frozenset(extract_dois(identifier_text)),
+                    frozenset(tokenize(title)), title_shingles(title))
+
+def catalogue_keys(row):
+    return make_keys(row.get("Title", ""), parse_year(row.get("Year")),
+                     f"{row.get('ISBN_DOI') or ''} {row.get('URL') or ''}")
+
+def work_keys(work):
+    """Keys of a timeline work (build-data.js copies ISBN_DOI into "isbn")."""
+    year = work.get("year")
+    return make_keys(work.get("title", ""), year if isinstance(year, int) else parse_year(str(year or "")),
+                     f"{work.get('isbn') or ''} {work.get('url') or ''}")
+
+def entry_keys(entry):
+    return LinkKeys(entry.title, parse_year(entry.date), frozenset(entry.isbns), frozenset(entry.dois),
+                    frozenset(tokenize(entry.title)), title_shingles(entry.title))
+
+def title_similarity(a, b, containment=True):
+    """
+    Trigram similarity: Jaccard, or when one title contains the other
+    ("Dora the Explorer" in "Nickelodeon: Dora the Explorer") a slightly
+    discounted containment.
+    """
+    if not a or not b:
+        return 0.0
+    shared = len(a & b) if len(a) < len(b) else len(b & a)
+    jaccard = shared / (len(a) + len(b) - shared)
+    if containment and shared == min(len(a), len(b)):
+        return max(jaccard, 0.9)
+    return jaccard
+
+
+# --- Blocking --------------------------------------------------------------
+
+class TitleBlocker:
+    """
+    Candidate pairs by blocking on title words with prefix filtering.
+    Words are ranked rarest first across all titles. Two word sets with
+    Jaccard similarity of at least threshold must share one of the first
+    len(set) - ceil(threshold * len(set)) + 1 ranked words of each, so
+    only those prefixes are indexed and probed: common words like "the"
+    never form blocks, and no pair of titles that similar is missed.
+    """
+
+    def __init__(self, word_sets, threshold=BLOCKING_THRESHOLD):
+        self.frequency = Counter(word for words in word_sets for word in words)
+        self.threshold = threshold
+        self.postings = {}
+
+    def prefix(self, words):
+        ranked = sorted(words, key=lambda word: (self.frequency.get(word, 0), word))
+        return ranked[:len(ranked) - math.ceil(self.threshold * len(ranked)) + 1]
+
+    def add(self, key, words):
+        for word in self.prefix(words):
+            self.postings.setdefault(word, []).append(key)
+
+    def candidates(self, words):
+        """Keys of added titles that may reach threshold similarity with words."""
+        found = set()
+        for word in self.prefix(words):
+            found.update(self.postings.get(word, ()))
+        return found
+
+
+# --- Linkage ---------------------------------------------------------------
+
+def link_records(left, right, threshold=MATCH_THRESHOLD):
+    """
+    Link LinkKeys lists left and right one-to-one. Returns a list of
+    (left_index, right_index, method, score) with method "isbn", "doi"
+    or "title"; unlinked records are absent.
+    """
+    links = []
+    linked_left, linked_right = set(), set()
+
+    for method, field in (("isbn", "isbns"), ("doi", "dois")):
+        owners = {}
+        for index, keys in enumerate(right):
+            for value in getattr(keys, field):
+                owners.setdefault(value, index)
+        for index, keys in enumerate(left):
+            if index in linked_left:
+                continue
+            for value in sorted(getattr(keys, field)):
+                match = owners.get(value)
+                if match is not None and match not in linked_right:
+                    links.append((index, match, method, 1.0))
+                    linked_left.add(index)
+                    linked_right.add(match)
+                    break
+
+    blocker = TitleBlocker([keys.words for keys in left] + [keys.words for keys in right])
+    for index, keys in enumerate(right):
+        if index not in linked_right:
+            blocker.add(index, keys.words)
+
+    scored = []
+    for index, keys in enumerate(left):
+        if index in linked_left:
+            continue
+        for match in blocker.candidates(keys.words):
+            score = title_similarity(keys.shingles, right[match].shingles)
+            if score >= threshold:
+                scored.append((score, index, match))
+
+    # Greedy one-to-one assignment, best score first, ties broken by position
+    for score, index, match in sorted(scored, key=lambda item: (-item[0], item[1], item[2])):
+        if index not in linked_left and match not in linked_right:
+            links.append((index, match, "title", round(score, 3)))
+            linked_left.add(index)
+            linked_right.add(match)
+    return sorted(links)
+
+def find_duplicates(records, threshold=DUPLICATE_THRESHOLD):
+    """(first, second, score) for records of one source that look like the same work."""
+    scores = {}
+    owners = {}
+    for index, keys in enumerate(records):
+        for value in keys.isbns | keys.dois:
+            if value in owners:
+                scores[(owners[value], index)] = 1.0
+            owners.setdefault(value, index)
+
+    # Self-join: probe with each record before adding it, so every pair is seen once
+    blocker = TitleBlocker([keys.words for keys in records], BLOCKING_THRESHOLD)
+    for index, keys in enumerate(records):
+        for other in blocker.candidates(keys.words):
+            # Containment would pair "Teaching diversity" with every longer title about it
+            score = title_similarity(records[other].shingles, keys.shingles, containment=False)
+            if score >= threshold:
+                scores[(other, index)] = max(score, scores.get((other, index), 0.0))
+        blocker.add(index, keys.words)
+    return [(first, second, round(score, 3)) for (first, second), score in sorted(scores.items())]
+
+def link_conflicts(left_keys, right_keys):
+    """Fields on which two linked records disagree."""
+    conflicts = []
+    if title_similarity(left_keys.shingles, right_keys.shingles) < MATCH_THRESHOLD:
+        # Linked by identifier only, e.g. a chapter sharing its book's ISBN
+        conflicts.append({"field": "title", "values": [left_keys.title, right_keys.title]})
+    if left_keys.year is not None and right_keys.year is not None and left_keys.year != right_keys.year:
+        conflicts.append({"field": "year", "values": [left_keys.year, right_keys.year]})
+    for field in ("isbns", "dois"):
+        left_values, right_values = getattr(left_keys, field), getattr(right_keys, field)
+        if left_values and right_values and not left_values & right_values:
+            conflicts.append({"field": field[:-1], "values": [sorted(left_values), sorted(right_values)]})
+    return conflicts
+
+
+# --- Merging ---------------------------------------------------------------
+
+def bibliography_fields(entry):
+    """What a merged record or timeline work takes from a bibliography entry."""
+    return {field: value for field, value in (("citation", entry.citation), ("annotation", entry.annotation)) if value}
+
+def merged_record(row_keys, entry_keys, entry):
+    """
+    Fields of one merged work. The CSV's title and year win; identifiers
+    are the union of both sources; citation and annotation come from the
+    bibliography entry.
+    """
+    sources = [keys for keys in (row_keys, entry_keys) if keys is not None]
+    years = [keys.year for keys in sources if keys.year is not None]
+    record = {
+        "title": sources[0].title,
+        "year": years[0] if years else None,
+        "isbns": sorted(set().union(*(keys.isbns for keys in sources))),
+        "dois": sorted(set().union(*(keys.dois for keys in sources))),
+    }
+    if entry is not None:
+        record["urls"] = list(entry.urls)
+        record.update(bibliography_fields(entry))
+    return record
+
+def merge_records(rows, entries):
+    """
+    Link CSV rows to bibliography entries. Returns (merged, report):
+    merged has one record per work (every row, then unlinked entries),
+    report lists links with their conflicts and suspected duplicates.
+    """
+    row_keys = [catalogue_keys(row) for row in rows]
+    entry_keys_list = [entry_keys(entry) for entry in entries]
+    links = link_records(row_keys, entry_keys_list)
+    linked_entries = {row_index: (entry_index, method, score) for row_index, entry_index, method, score in links}
+
+    merged = []
+    conflicts = []
+    for row_index, row in enumerate(rows):
+        link = linked_entries.get(row_index)
+        entry = entries[link[0]] if link is not None else None
+        record = merged_record(row_keys[row_index], entry_keys_list[link[0]] if link else None, entry)
+        record["category"] = row.get("Category", "")
+        record["sources"] = ["csv", "bibliography"] if link else ["csv"]
+        if link is not None:
+            record["link"] = {"method": link[1], "score": link[2]}
+            found = link_conflicts(row_keys[row_index], entry_keys_list[link[0]])
+            if found:
+                record["conflicts"] = found
+                conflicts.append({"csv_row": row_index, "title": record["title"], "entry_title": entry.title,
+                                  "conflicts": found})
+        record["csv"] = row
+        merged.append(record)
+
+    linked = {entry_index for entry_index, _, _ in linked_entries.values()}
+    for entry_index, entry in enumerate(entries):
+        if entry_index not in linked:
+            record = merged_record(None, entry_keys_list[entry_index], entry)
+            record["category"] = entry.section
+            record["sources"] = ["bibliography"]
+            merged.append(record)
+
+    report = {
+        "csv_rows": len(rows),
+        "bibliography_entries": len(entries),
+        "links": [
+            {"csv_row": row_index, "entry": entry_index, "method": method, "score": score,
+             "title": rows[row_index].get("Title", ""), "entry_title": entries[entry_index].title}
+            for row_index, entry_index, method, score in links
+        ],
+        "conflicts": conflicts,
+        "duplicates": {
+            "csv": [{"rows": [first, second], "score": score,
+                     "titles": [rows[first].get("Title", ""), rows[second].get("Title", "")]}
+                    for first, second, score in find_duplicates(row_keys)],
+            "bibliography": [{"entries": [first, second], "score": score,
+                              "titles": [entries[first].title, entries[second].title]}
+                             for first, second, score in find_duplicates(entry_keys_list)],
+        },
+        "unlinked_csv_rows": [index for index in range(len(rows)) if index not in linked_entries],
+        "unlinked_entries": [index for index in range(len(entries)) if index not in linked],
+    }
+    return merged, report
+
+def annotate_works(works, entries):
+    """
+    Attach the citation and annotation of the linked bibliography entry
+    to each timeline work, clearing them from works no longer linked.
+    Returns the number of works that got a citation or annotation.
+    """
+    links = link_records([work_keys(work) for work in works], [entry_keys(entry) for entry in entries])
+    linked = {work_index: entry_index for work_index, entry_index, _, _ in links}
+    annotated = 0
+    for work_index, work in enumerate(works):
+        fields = bibliography_fields(entries[linked[work_index]]) if work_index in linked else {}
+        for field in ("citation", "annotation"):
+            if field in fields:
+                work[field] = fields[field]
+            else:
+                work.pop(field, None)
+        annotated += bool(fields)
+    return annotated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Link the CSV database to the annotated bibliography.")
+    parser.add_argument("--csv", type=Path, default=CSV_PATH)
+    parser.add_argument("--bibliography", type=Path, default=BIBLIOGRAPHY_PATH)
+    parser.add_argument("--output", type=Path, default=MERGED_PATH, help="Merged records JSON")
+    parser.add_argument("--report", type=Path, default=REPORT_PATH, help="Conflicts and duplicates report JSON")
+    args = parser.parse_args()
+
+    rows = load_catalogue(args.csv)
+    entries = parse_bibliography(args.bibliography)
+    merged, report = merge_records(rows, entries)
+
+    for path, value in ((args.output, merged), (args.report, report)):
+        if write_if_changed(path, json.dumps(value, indent=2, ensure_ascii=False).encode("utf-8")):
+            print(f"Wrote {path}")
+
+    methods = {}
+    for link in report["links"]:
+        methods[link["method"]] = methods.get(link["method"], 0) + 1
+    print(f"\n{len(rows)} CSV rows, {len(entries)} bibliography entries, {len(merged)} merged records")
+    print(f"Linked: {len(report['links'])} ({', '.join(f'{count} by {method}' for method, count in methods.items())})")
+    print(f"Conflicts: {len(report['conflicts'])}")
+    for conflict in report["conflicts"]:
+        fields = ", ".join(f"{item['field']} {item['values'][0]} vs {item['values'][1]}" for item in conflict["conflicts"])
+        print(f"  {conflict['title']}: {fields}")
+    for source, pairs in report["duplicates"].items():
+        print(f"Possible duplicates in {source}: {len(pairs)}")
+        for pair in pairs:
+            print(f"  {pair['titles'][0]} ~ {pair['titles'][1]} ({pair['score']})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Prebuilt inverted search index for the timeline.
+
+Work ids are positions in the order DataLoader.getAllWorks() flattens the
+timeline (decade, then category, then work). The index holds the sorted
+vocabulary of title, category, description, enhanced_description,
+related_themes and year tokens, with one delta-encoded posting list of
+work ids per term. Prefix lookups binary-search the vocabulary, so a
+query costs time in its matching terms and results, not the catalogue.
+
+This matches each query word against the start of indexed words, unlike
+the substring scan the site falls back to without an index: "hist" finds
+"History" but "story" no longer does. Mid-word matches are given up for
+lookups that do not grow with the catalogue.
+
+titles_hash identifies the works the ids refer to; the site ignores an
+index whose hash differs from its own data's, which catches a stale
+index with the same number of works in a different order.
+
+Usage: python search_index.py "query" [--index PATH] [--timeline PATH]
+"""
+
+import argparse
+import bisect
+import json
+import re
+from pathlib import Path
+
+from rag_corpus import normalize_text
+
+INDEX_VERSION = 2
+FNV_OFFSET = 0x811C9DC5
+FNV_PRIME = 0x01000193
+INDEXED_FIELDS = ("title", "category", "description", "enhanced_description", "related_themes", "year")
+
+# Keep in step with tokenizeSearchText() in assets/js/app.js
+SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+DATA_DIR = Path(__file__).parent.parent / "assets" / "data"
+SEARCH_INDEX_PATH = DATA_DIR / "search-index.json"
+TIMELINE_PATH = DATA_DIR / "timeline-data.json"
+
+
+def search_tokens(text):
+    return SEARCH_TOKEN_RE.findall(normalize_text(text))
+
+def iter_timeline_works(timeline):
+    """Works in getAllWorks() order; the position is the work id."""
+    for decade_data in timeline["decades"].values():
+        for works in decade_data.get("categories", {}).values():
+            yield from works
+
+def work_tokens(work):
+    tokens = set()
+    for field in INDEXED_FIELDS:
+        value = work.get(field)
+        if value is None:
+            continue
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            tokens.update(search_tokens(str(item)))
+    return tokens
+
+def titles_hash(works):
+    """
+    FNV-1a (32-bit) of the titles joined by newlines, over UTF-16 code
+    units. Keep in step with titlesHash() in assets/js/app.js.
+    """
+    data = "\n".join(work.get("title", "") for work in works).encode("utf-16-le")
+    digest = FNV_OFFSET
+    for offset in range(0, len(data), 2):
+        digest ^= data[offset] | data[offset + 1] << 8
+        digest = digest * FNV_PRIME & 0xFFFFFFFF
+    return f"{digest:08x}"
+
+def delta_encode(ids):
+    previous = 0
+    encoded = []
+    for work_id in ids:
+        encoded.append(work_id - previous)
+        previous = work_id
+    return encoded
+
+def delta_decode(encoded):
+    work_id = 0
+    for delta in encoded:
+        work_id += delta
+        yield work_id
+
+def build_search_index(timeline):
+    """Build the index as a JSON-serializable dict."""
+    postings = {}
+    works = list(iter_timeline_works(timeline))
+    for work_id, work in enumerate(works):
+        for token in work_tokens(work):
+            postings.setdefault(token, []).append(work_id)
+
+    terms = sorted(postings)
+    return {
+        "version": INDEX_VERSION,
+        "works": len(works),
+        "titles_hash": titles_hash(works),
+        "terms": terms,
+        "postings": [delta_encode(postings[term]) for term in terms],
+    }
+
+def serialize_search_index(index):
+    return json.dumps(index, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class SearchIndex:
+    """Query API over a built or loaded index."""
+
+    def __init__(self, index):
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version: {index.get('version')}")
+        self.work_count = index["works"]
+        self.titles_hash = index["titles_hash"]
+        self.terms = index["terms"]
+        self.postings = index["postings"]
+
+    @classmethod
+    def load(cls, path=SEARCH_INDEX_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def prefix_ids(self, prefix):
+        """Ids of works with any token starting with prefix."""
+        ids = set()
+        start = bisect.bisect_left(self.terms, prefix)
+        for position in range(start, len(self.terms)):
+            if not self.terms[position].startswith(prefix):
+                break
+            ids.update(delta_decode(self.postings[position]))
+        return ids
+
+    def search(self, query):
+        """Sorted ids of works matching every query token as a prefix."""
+        result = None
+        # Rarest-looking (longest) tokens first keeps intersections small
+        for token in sorted(set(search_tokens(query)), key=len, reverse=True):
+            ids = self.prefix_ids(token)
+            result = ids if result is None else result & ids
+            if not result:
+                return []
+        return sorted(result) if result else []
+
+    def search_works(self, timeline, query):
+        """Resolve search() ids to the work dicts of timeline."""
+        ids = self.search(query)
+        if not ids:
+            return []
+        works = list(iter_timeline_works(timeline))
+        if len(works) != self.work_count or titles_hash(works) != self.titles_hash:
+            raise ValueError("Search index does not match this timeline; rebuild it")
+        return [works[work_id] for work_id in ids]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the prebuilt timeline search index.")
+    parser.add_argument("query")
+    parser.add_argument("--index", type=Path, default=SEARCH_INDEX_PATH)
+    parser.add_argument("--timeline", type=Path, default=TIMELINE_PATH)
+    args = parser.parse_args()
+
+    with open(args.timeline, "r", encoding="utf-8") as f:
+        timeline = json.load(f)
+    works = SearchIndex.load(args.index).search_works(timeline, args.query)
+    for work in works:
+        print(f"{work.get('year')}  {work.get('category')}: {work.get('title')}")
+    print(f"\n{len(works)} result(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Local HTTP server and file watcher for enrich-from-rag.py --serve.
+
+Generated outputs (the timeline JSON, its shards and the search index)
+live in memory as Resources: the bytes, a strong ETag and the
+precompressed variants, built once per content change. The page itself
+(index.html and assets/) is served from the website directory on disk, so
+the page, its data and its shards share one origin and DataLoader never
+falls back to mock data. Nothing else in that directory is reachable: not
+the scripts, their caches, the source documents or any dot-path.
+
+Every response carries an ETag and Cache-Control: no-cache, so a client
+revalidates with If-None-Match and gets a bodiless 304 until a rebuild
+actually changes the bytes.
+
+Changes are found by polling (stdlib only): directory mtimes every tick,
+which catch files being created, deleted or renamed, and a full scan of
+file sizes and mtimes as often as its measured cost allows, which catches
+edits in place. Changes are debounced, so an editor's save-rename-touch
+sequence triggers one rebuild.
+"""
+
+import asyncio
+import mimetypes
+import os
+import time
+from email.utils import formatdate
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from enrich_cache import hash_bytes
+from timeline_shards import compressed_variants
+
+POLL_INTERVAL = 0.1      # seconds between directory mtime checks of the watched paths
+DEBOUNCE_SECONDS = 0.2   # quiet time after the last change before rebuilding
+SWEEP_CPU_SHARE = 0.02   # share of a core periodic full scans may take
+MAX_HEADER_BYTES = 16 << 10
+
+# The only parts of the website directory served from disk
+STATIC_FILES = {"index.html"}
+STATIC_DIRS = {"assets"}
+
+# Content-Encoding for each compressed_variants suffix, in order of preference
+ENCODINGS = {".br": "br", ".gz": "gzip"}
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 431: "Request Header Fields Too Large"}
+
+
+class Resource:
+    """In-memory response body with its ETag and precompressed variants."""
+
+    def __init__(self, data, content_type="application/json; charset=utf-8"):
+        self.data = data
+        self.content_type = content_type
+        self.digest = hash_bytes(data)
+        # Each encoding is a distinct representation, so each gets its own strong ETag
+        self.etag = f'"{self.digest[:20]}"'
+        self.variants = {ENCODINGS[suffix]: compressed for suffix, compressed in compressed_variants(data)}
+
+    def representation(self, accepted):
+        """(body, content_encoding, etag) for the best encoding the client accepts."""
+        for encoding in ENCODINGS.values():
+            if encoding in self.variants and encoding in accepted:
+                return self.variants[encoding], encoding, f'"{self.digest[:20]}-{encoding}"'
+        return self.data, None, self.etag
+
+
+class ResourceStore:
+    """URL path -> Resource; swapped whole so requests never see a half-built set."""
+
+    def __init__(self):
+        self.resources = {}
+
+    def update(self, outputs):
+        """
+        Replace the served outputs with {url_path: bytes}. Unchanged bytes
+        keep their Resource, so only changed outputs are recompressed.
+        Returns the url paths whose content changed.
+        """
+        resources = {}
+        changed = []
+        for path, data in outputs.items():
+            resource = self.resources.get(path)
+            if resource is None or resource.data != data:
+                resource = Resource(data)
+                changed.append(path)
+            resources[path] = resource
+        changed.extend(path for path in self.resources if path not in resources)
+        self.resources = resources
+        return changed
+
+    def get(self, path):
+        return self.resources.get(path)
+
+
+def parse_accept_encoding(header):
+    """Encodings the client accepts (q > 0)."""
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name)
+    return accepted
+
+def etag_matches(header, etag):
+    """Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 asks)."""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def static_resource(root, url_path):
+    """
+    (path, etag) of a site file under root, or None. Only STATIC_FILES and
+    files under STATIC_DIRS qualify ("/" is index.html); dot-paths never do.
+    """
+    parts = [part for part in url_path.split("/") if part]
+    if not parts:
+        parts = ["index.html"]
+    if any(part.startswith(".") or "\\" in part for part in parts):
+        return None
+    allowed = parts[0] in STATIC_DIRS if len(parts) > 1 else parts[0] in STATIC_FILES
+    if not allowed:
+        return None
+    root = Path(root).resolve()
+    try:
+        path = root.joinpath(*parts).resolve()
+        if root not in path.parents:
+            return None
+        stat = path.stat()
+    except (OSError, ValueError):
+        return None
+    if not path.is_file():
+        return None
+    return path, f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+class TimelineServer:
+    """HTTP/1.1 server for a ResourceStore with a static file fallback."""
+
+    def __init__(self, store, static_root):
+        self.store = store
+        self.static_root = static_root
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, "GET", 431, keep_alive=False)
+                    return
+                except asyncio.IncompleteReadError:
+                    return
+                keep_alive = await self.handle_request(head, writer)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, head, writer):
+        """Answer one request; returns whether to keep the connection open."""
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            await self.respond(writer, "GET", 400, keep_alive=False)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        if method not in ("GET", "HEAD"):
+            # Any request body is left unread, so the connection cannot be reused
+            await self.respond(writer, method, 405, {"Allow": "GET, HEAD"}, keep_alive=False)
+            return False
+
+        path = unquote(urlsplit(target).path)
+        resource = self.store.get(path)
+        if resource is not None:
+            accepted = parse_accept_encoding(headers.get("accept-encoding", ""))
+            body, encoding, etag = resource.representation(accepted)
+            extra = {"Content-Type": resource.content_type, "ETag": etag, "Vary": "Accept-Encoding"}
+            if encoding is not None:
+                extra["Content-Encoding"] = encoding
+        else:
+            found = static_resource(self.static_root, path)
+            if found is None:
+                await self.respond(writer, method, 404, keep_alive=keep_alive)
+                return keep_alive
+            file_path, etag = found
+            content_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+            extra = {"Content-Type": content_type, "ETag": etag}
+            body = file_path
+
+        if etag_matches(headers.get("if-none-match", ""), etag):
+            await self.respond(writer, method, 304, extra, keep_alive=keep_alive)
+        else:
+            body = body.read_bytes() if isinstance(body, Path) else body
+            await self.respond(writer, method, 200, extra, body, keep_alive)
+        return keep_alive
+
+    async def respond(self, writer, method, status, headers=None, body=None, keep_alive=True):
+        if body is None and status != 304:
+            body = STATUS_TEXT[status].encode("ascii") if status != 200 else b""
+        response = {
+            "Date": formatdate(usegmt=True),
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive" if keep_alive else "close",
+        }
+        response.update(headers or {})
+        if status != 304:
+            response["Content-Length"] = str(len(body))
+        head = f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in response.items()) + "\r\n"
+        writer.write(head.encode("latin-1"))
+        if body and status != 304 and method != "HEAD":
+            writer.write(body)
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+
+
+def scan_tree(paths):
+    """
+    ({file: (size, mtime_ns)}, {directory: mtime_ns}) for every file and
+    directory under paths (files or directories); missing paths map to None.
+    """
+    files, dirs = {}, {}
+    pending = []
+    for path in map(str, paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            files[path] = None
+            continue
+        if os.path.isdir(path):
+            dirs[path] = stat.st_mtime_ns
+            pending.append(path)
+        else:
+            files[path] = (stat.st_size, stat.st_mtime_ns)
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except OSError:
+            continue  # removed since its parent was listed; the parent's mtime shows it
+        for entry in entries:
+            try:
+                stat = entry.stat()
+                if entry.is_dir():
+                    dirs[entry.path] = stat.st_mtime_ns
+                    pending.append(entry.path)
+                else:
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                pass
+    return files, dirs
+
+def quick_state(paths, dirs):
+    """
+    mtimes of the top-level paths and of the directories of the last
+    scan_tree(): any file created, deleted or renamed changes one of them,
+    which covers the save-by-rename most editors do.
+    """
+    state = []
+    for path in [*map(str, paths), *dirs]:
+        try:
+            state.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            state.append((path, None))
+    return state
+
+async def watch(paths, on_change, interval=POLL_INTERVAL, debounce=DEBOUNCE_SECONDS,
+                sweep_share=SWEEP_CPU_SHARE):
+    """
+    Call on_change() (a coroutine function) once the files under paths()
+    change and then stay unchanged for debounce seconds. paths is called
+    on every check.
+
+    Every interval only the directory mtimes are checked. A full scan of
+    every file's size and mtime, which also catches edits in place, runs
+    when those change, while a change is settling, and otherwise no more
+    often than keeps scanning to sweep_share of a core. Checks run in a
+    worker thread so large trees do not stall the server.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def full_scan():
+        started = time.monotonic()
+        tree = await loop.run_in_executor(None, scan_tree, paths())
+        return tree, max(interval, (time.monotonic() - started) / sweep_share)
+
+    seen, scan_every = await full_scan()
+    quick = await loop.run_in_executor(None, quick_state, paths(), seen[1])
+    scanned_at = time.monotonic()
+    changed_at = None
+    while True:
+        await asyncio.sleep(interval)
+        current_quick = await loop.run_in_executor(None, quick_state, paths(), seen[1])
+        due = time.monotonic() - scanned_at >= scan_every
+        if current_quick != quick or changed_at is not None or due:
+            current, scan_every = await full_scan()
+            scanned_at = time.monotonic()
+            # Directories may have come or gone, so the quick state is taken afresh
+            quick = await loop.run_in_executor(None, quick_state, paths(), current[1])
+            if current != seen:
+                seen = current
+                changed_at = time.monotonic()
+                continue
+        if changed_at is not None and time.monotonic() - changed_at >= debounce:
+            changed_at = None
+            await on_change()
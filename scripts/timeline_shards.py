@@ -0,0 +1,184 @@
+"""
+Sharded, precompressed output for the enriched timeline.
+
+Instead of one pretty-printed timeline-data.json, writes to a directory:
+- manifest.json: the short biography and, per decade, its theme, work
+  counts and the names of its shards. Enough to render the timeline.
+- biography.json: personal_background, timeline_highlights, awards.
+- <decade>.json: decade summary, key achievements and the listing
+  metadata of its works (or, with per-category sharding, just the
+  summary, with listings in <decade>--<category>.json).
+- *.bodies.json: the remaining, heavier work fields keyed by work id.
+
+Work ids match the search index (positions in getAllWorks() order), so
+adding one work shifts the ids of every later one. Shard names therefore
+carry a hash of their content (1970s.bodies.<hash>.json): a manifest can
+only ever name the shards built with it, and a client holding an old
+manifest gets a 404 rather than an old listing paired with new bodies.
+The manifest and its variants are written last, so it never names a
+shard that is not there yet.
+
+Every file is compact JSON with .gz and, when the brotli module is
+installed, .br variants alongside. Once the new manifest is in place,
+shards only the previous manifest listed are removed; nothing else is,
+so the shard directory can be shared with other files.
+"""
+
+import gzip
+import json
+import re
+from pathlib import Path
+
+from enrich_cache import hash_bytes, write_if_changed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SHARD_VERSION = 1
+SHARD_BY_DECADE = "decade"
+SHARD_BY_CATEGORY = "category"
+
+MANIFEST_NAME = "manifest.json"
+BIOGRAPHY_SHARD = "biography.json"
+SHARD_HASH_CHARS = 12
+
+# Biography fields kept in the manifest; the rest go to biography.json
+MANIFEST_BIOGRAPHY_FIELDS = ("name", "title", "institution", "birthYear", "careerStart", "totalWorks", "bio")
+# Work fields needed to list a work; the rest go to the bodies shards
+LISTING_FIELDS = ("title", "year", "category", "awards")
+
+
+def category_slug(category):
+    return re.sub(r"[^a-z0-9]+", "-", category.lower()).strip("-") or "uncategorized"
+
+def encode_shard(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def compressed_variants(data):
+    """(suffix, bytes) for every precompressed encoding available."""
+    # mtime=0 keeps the gzip bytes identical between runs
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    return variants
+
+def content_name(name, data):
+    """name with a hash of data before its .json suffix."""
+    return f"{name.removesuffix('.json')}.{hash_bytes(data)[:SHARD_HASH_CHARS]}.json"
+
+def build_shards(timeline, shard_by=SHARD_BY_DECADE):
+    """
+    Return {filename: JSON-serializable value} for the whole sharded
+    output, with the manifest last. Every name but the manifest's is
+    content-hashed.
+    """
+    if shard_by not in (SHARD_BY_DECADE, SHARD_BY_CATEGORY):
+        raise ValueError(f"Unknown shard mode: {shard_by}")
+
+    biography = timeline.get("biography", {})
+    manifest = {
+        "version": SHARD_VERSION,
+        "biography": {field: biography[field] for field in MANIFEST_BIOGRAPHY_FIELDS if field in biography},
+        "biography_shard": BIOGRAPHY_SHARD,
+        "decades": {},
+    }
+    shards = {
+        BIOGRAPHY_SHARD: {field: value for field, value in biography.items()
+                          if field not in MANIFEST_BIOGRAPHY_FIELDS},
+    }
+
+    work_id = 0
+    for decade_key, decade_data in timeline["decades"].items():
+        decade_shard_name = f"{decade_key}.json"
+        decade_shard = {field: value for field, value in decade_data.items()
+                        if field not in ("theme", "totalWorks", "categories")}
+        decade_shard["categories"] = {}
+        decade_entry = {
+            "theme": decade_data.get("theme"),
+            "totalWorks": decade_data.get("totalWorks", 0),
+            "shard": decade_shard_name,
+            "categories": {},
+        }
+
+        for category, works in decade_data.get("categories", {}).items():
+            if shard_by == SHARD_BY_CATEGORY:
+                stem = f"{decade_key}--{category_slug(category)}"
+                listing_name = f"{stem}.json"
+                listing_shard = shards.setdefault(listing_name, {"categories": {}})
+            else:
+                stem = decade_key
+                listing_name = decade_shard_name
+                listing_shard = decade_shard
+            bodies_name = f"{stem}.bodies.json"
+            bodies = shards.setdefault(bodies_name, {})
+
+            listing = listing_shard["categories"].setdefault(category, [])
+            for work in works:
+                entry = {"id": work_id}
+                entry.update((field, work[field]) for field in LISTING_FIELDS if field in work)
+                listing.append(entry)
+                bodies[str(work_id)] = {field: value for field, value in work.items() if field not in LISTING_FIELDS}
+                work_id += 1
+
+            decade_entry["categories"][category] = {
+                "works": len(works),
+                "shard": listing_name,
+                "bodies": bodies_name,
+            }
+
+        shards[decade_shard_name] = decade_shard
+        manifest["decades"][decade_key] = decade_entry
+
+    # Shards never name each other, so only the manifest needs the hashed names
+    names = {name: content_name(name, encode_shard(value)) for name, value in shards.items()}
+    manifest["biography_shard"] = names[BIOGRAPHY_SHARD]
+    for decade_entry in manifest["decades"].values():
+        decade_entry["shard"] = names[decade_entry["shard"]]
+        for category_entry in decade_entry["categories"].values():
+            category_entry["shard"] = names[category_entry["shard"]]
+            category_entry["bodies"] = names[category_entry["bodies"]]
+    manifest["works"] = work_id
+    manifest["encodings"] = ["gzip", "br"] if brotli is not None else ["gzip"]
+    manifest["files"] = sorted(names.values())
+
+    shards = {names[name]: value for name, value in shards.items()}
+    shards[MANIFEST_NAME] = manifest
+    return shards
+
+def previous_shard_files(shard_dir):
+    """Shard file names the manifest already in shard_dir lists; empty if there is none."""
+    try:
+        with open(Path(shard_dir) / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            files = json.load(f).get("files", [])
+    except (OSError, ValueError, AttributeError):
+        return []
+    # Never follow a name out of the directory
+    return [name for name in files if isinstance(name, str) and Path(name).name == name]
+
+def write_shards(timeline, shard_dir, shard_by=SHARD_BY_DECADE):
+    """
+    Write the sharded output and its compressed variants to shard_dir,
+    the manifest last, then remove shards the previous manifest listed
+    that are no longer produced. Returns (files_written, total_files).
+    """
+    shard_dir = Path(shard_dir)
+    previous = previous_shard_files(shard_dir)
+    written = 0
+    expected = set()
+    # build_shards puts the manifest last, so every shard it names exists before it does
+    for name, value in build_shards(timeline, shard_by).items():
+        data = encode_shard(value)
+        outputs = [(name, data)] + [(name + suffix, compressed) for suffix, compressed in compressed_variants(data)]
+        for filename, content in outputs:
+            expected.add(filename)
+            if write_if_changed(shard_dir / filename, content):
+                written += 1
+
+    for name in previous:
+        for filename in (name, name + ".gz", name + ".br"):
+            path = shard_dir / filename
+            if filename not in expected and path.is_file():
+                path.unlink()
+    return written, len(expected)